@@ -44,7 +44,7 @@ logger.setLevel(logging.DEBUG)
 from fastapi import FastAPI
 from app.core.config import Config
 from slowapi.middleware import SlowAPIMiddleware
-from app.services.chatbot_service import ChatbotService
+from app.services.chatbot_service import ChatbotService, build_tool_executor
 from app.services.rag_service import RAGPipeline
 from app.services.web.web_search_factory import WebSearchProviderFactory
 from app.services.llm_engine.factory import create_llm_engine
@@ -55,6 +55,15 @@ from starlette.middleware.sessions import SessionMiddleware
 import itsdangerous
 from app.services.code_execution.execution_service import CodeExecutionService
 from app.services.web.web_fetch import WebFetchService
+from app.services.web.fetch_cache import WebFetchCache
+from app.services.cache.answer_cache import SemanticAnswerCache
+from app.services.cache.fanout import GenerationFanout
+from app.services.compaction_service import HistoryCompactor
+from app.core.metrics import run_runtime_monitor
+from app.core.warmup import Readiness, run_warmup
+from app.services.code_execution.sandbox_pool import SandboxPool
+from app.services.llm_engine.tokenizer import count_tokens
+from app.services.tools.budget import ToolResultBudget
 
 # Ensure application data directories exist (after Config import)
 if not os.path.exists(Config.DATA_DIR):
@@ -65,17 +74,34 @@ if not os.path.exists(Config.INDEX_DIR):
     os.makedirs(Config.INDEX_DIR, exist_ok=True)
 
 
-def create_app() -> FastAPI:
+def create_app(rag_service: RAGPipeline = None) -> FastAPI:
+    """Build the app and its per-worker state (HTTP and provider clients, caches, sandbox pool).
 
-    history_store = InMemoryStore()
+    Pass a `rag_service` loaded before forking (see asgi.py) to share its
+    embedding model between workers instead of loading one per worker.
+    """
 
-    if not Config.LLM_API_KEY:
+    history_store = InMemoryStore(
+        max_sessions=Config.HISTORY_MAX_SESSIONS,
+        max_bytes=Config.HISTORY_MAX_BYTES,
+        idle_ttl=Config.HISTORY_SESSION_TTL,
+        max_messages=Config.HISTORY_MAX_MESSAGES,
+    )
+
+    if not Config.LLM_API_KEY and Config.LLM_PROVIDER != "router":
         logger.error("LLM_API_KEY environment variable is not set")
 
     # Shared clients
     http_client = httpx.AsyncClient()
     web_search_service = WebSearchProviderFactory.get_provider(Config, http_client)
-    web_fetch_service = WebFetchService()
+    web_fetch_cache = None
+    if Config.WEB_FETCH_CACHE_ENABLED:
+        web_fetch_cache = WebFetchCache(
+            Config.WEB_FETCH_CACHE_DIR,
+            max_bytes=Config.WEB_FETCH_CACHE_MAX_BYTES,
+            default_ttl=Config.WEB_FETCH_CACHE_DEFAULT_TTL,
+        )
+    web_fetch_service = WebFetchService(cache=web_fetch_cache)
     # Build provider-specific LLM client and engine, then inject into services
     provider = getattr(Config, "LLM_PROVIDER", None)
     if not provider:
@@ -84,16 +110,55 @@ def create_app() -> FastAPI:
     
     llm_client = build_llm_client(provider, Config)
     llm_engine = create_llm_engine(provider, llm_client)
-    code_executor = CodeExecutionService(llm_engine)
-    rag_service = RAGPipeline()
+    sandbox_pool = None
+    if "sandbox" in Config.WARMUP_STEPS and Config.SANDBOX_POOL_SIZE > 0:
+        sandbox_pool = SandboxPool(Config.SANDBOX_POOL_SIZE, Config.SANDBOX_PRELOAD_MODULES)
+    code_executor = CodeExecutionService(llm_engine, sandbox_pool)
+    rag_service = rag_service or RAGPipeline()
+    # Tool dispatch (and its page chunker/retriever) holds no per-request state: build it once
+    tool_executor = build_tool_executor(web_search_service, web_fetch_service, rag_service, code_executor)
+    tool_budget = ToolResultBudget(model=Config.MODEL_NAME)
+    answer_cache = None
+    if Config.ANSWER_CACHE_ENABLED:
+        answer_cache = SemanticAnswerCache(
+            threshold=Config.ANSWER_CACHE_THRESHOLD,
+            ttl=Config.ANSWER_CACHE_TTL,
+            max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+        )
+
+    compactor = HistoryCompactor(llm_engine, history_store) if Config.COMPACTION_ENABLED else None
+    readiness = Readiness()
+
+    async def warm_models():
+        await rag_service.warm_up()
+        await asyncio.to_thread(count_tokens, "warm-up", Config.MODEL_NAME)
+
+    warmup_steps = {
+        "embedding": warm_models,
+        "llm": llm_engine.warm_up,
+        "sandbox": sandbox_pool.start if sandbox_pool else None,
+    }
+    warmup_steps = {name: step for name, step in warmup_steps.items() if step and name in Config.WARMUP_STEPS}
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         # Initialize RAG index after trees are saved
+        monitor = None
+        warmup = None
         try:
             rag_service.init_index()
+            monitor = asyncio.create_task(run_runtime_monitor(history_store))
+            # Serve /healthz straight away; /readyz turns ready once warm-up is done
+            warmup = asyncio.create_task(run_warmup(readiness, warmup_steps, Config.WARMUP_TIMEOUT))
             yield
         finally:
+            for task in (warmup, monitor):
+                if task:
+                    task.cancel()
+            if compactor:
+                await compactor.close()
+            if sandbox_pool:
+                await sandbox_pool.close()
             await http_client.aclose()
 
     app = FastAPI(lifespan=lifespan)
@@ -103,9 +168,17 @@ def create_app() -> FastAPI:
         )
     
     app.add_middleware(SlowAPIMiddleware)
+    app.state.web_fetch_cache = web_fetch_cache
+    app.state.answer_cache = answer_cache
+    app.state.readiness = readiness
+    fanout = GenerationFanout() if Config.COALESCE_ENABLED else None
 
     from app.routes.chatbot_routes import init_chatbot_routes
-    init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, history_store, code_executor )
+    from app.routes.metrics_routes import init_metrics_routes
+    from app.routes.health_routes import init_health_routes
+    init_metrics_routes(app)
+    init_health_routes(app, readiness)
+    init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, history_store, code_executor, answer_cache, fanout, compactor, tool_executor, tool_budget)
 
     return app
 
@@ -181,11 +181,7 @@ class AdminManager:
                 - Always use them internally to understand the user's needs.  
                 - Never mention, quote, or hint that they exist.  
                 - Rephrase or summarize relevant details naturally into your answer without revealing their source.
-
-                '''
-                CONTEXT
-                {{context}}
-                '''
+                - Knowledge-base context for the current question is given in a CONTEXT message after the conversation history.
 
                 OUTPUT STRUCTURE  
                 {tone_instructions['output_structure']}
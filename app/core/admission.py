@@ -0,0 +1,179 @@
+"""Admission control for LLM provider calls.
+
+At most `LLM_MAX_CONCURRENCY` calls hold a slot at once; the rest wait in a
+bounded queue and are admitted by priority (interactive chat, then
+code-generation, then batch), first-come within a priority. When the queue is
+full a new call either preempts the lowest-priority waiter or is rejected
+straight away with `AdmissionRejected`, which carries a Retry-After estimate.
+Waiting longer than the priority's queue timeout is also a rejection, so
+overload turns into fast 503s instead of slow answers and provider 429 storms.
+"""
+import asyncio
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncGenerator
+
+from app import logger
+from app.core import metrics
+from app.core.config import Config
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    CODEGEN = 1
+    BATCH = 2
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future")
+
+    def __init__(self, priority: Priority, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+    @property
+    def key(self) -> tuple:
+        return self.priority, self.seq
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeouts: dict):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeouts = queue_timeouts
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        # Smoothed slot hold time, for Retry-After estimates
+        self._hold_avg = 5.0
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._hold_avg / self.max_concurrent))
+
+    def _reject(self, priority: Priority, reason: str) -> AdmissionRejected:
+        metrics.ADMISSION_REJECTED.labels(priority=priority.label, reason=reason).inc()
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _set_gauges(self):
+        metrics.LLM_ACTIVE.set(self._active)
+        metrics.ADMISSION_QUEUED.set(len(self._waiters))
+
+    def _preemptable(self, priority: Priority):
+        """The lowest-priority waiter that a `priority` call may push out of a full queue, if any."""
+        if not self._waiters:
+            return None
+        victim = max(self._waiters, key=lambda w: w.key)
+        return victim if victim.priority > priority else None
+
+    def check(self, priority: Priority):
+        """Raise AdmissionRejected now if a `priority` call could not even be queued."""
+        if self._active < self.max_concurrent and not self._waiters:
+            return
+        if len(self._waiters) >= self.max_queue and self._preemptable(priority) is None:
+            raise self._reject(priority, "shed")
+
+    async def acquire(self, priority: Priority):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self._set_gauges()
+            metrics.ADMISSION_WAIT.labels(priority=priority.label).observe(0)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            victim = self._preemptable(priority)
+            if victim is None:
+                raise self._reject(priority, "queue_full")
+            self._waiters.remove(victim)
+            victim.future.set_exception(self._reject(victim.priority, "preempted"))
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._set_gauges()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeouts.get(priority.label))
+        except asyncio.TimeoutError:
+            if not self._granted(waiter):
+                self._remove(waiter)
+                raise self._reject(priority, "queue_timeout") from None
+            # Handed a slot just as the timeout fired: keep it
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+        finally:
+            metrics.ADMISSION_WAIT.labels(priority=priority.label).observe(time.monotonic() - started)
+
+    @staticmethod
+    def _granted(waiter: _Waiter) -> bool:
+        future = waiter.future
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _remove(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            self._set_gauges()
+
+    def release(self, held: float = None):
+        if held is not None:
+            self._hold_avg = 0.8 * self._hold_avg + 0.2 * held
+        while self._waiters:
+            waiter = min(self._waiters, key=lambda w: w.key)
+            self._waiters.remove(waiter)
+            if not waiter.future.done():
+                # Hand the slot straight to the waiter; the active count is unchanged
+                waiter.future.set_result(None)
+                self._set_gauges()
+                return
+        self._active -= 1
+        self._set_gauges()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority):
+        await self.acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self) -> dict:
+        return {"active": self._active, "queued": len(self._waiters), "max_concurrent": self.max_concurrent}
+
+
+admission = AdmissionController(Config.LLM_MAX_CONCURRENCY, Config.LLM_MAX_QUEUE, Config.LLM_QUEUE_TIMEOUTS)
+
+
+async def admitted(stream, priority: Priority) -> AsyncGenerator:
+    """Relay an engine stream while holding an admission slot for it.
+
+    The slot is taken on first iteration and held until the stream ends or is
+    closed, so a streaming response counts against the limit for its whole length.
+    """
+    try:
+        async with admission.slot(priority):
+            async for chunk in stream:
+                yield chunk
+    except AdmissionRejected as e:
+        logger.warning(f"LLM call rejected ({priority.label}): {e}")
+        raise
+    finally:
+        await stream.aclose()
@@ -1,6 +1,7 @@
 from dotenv import load_dotenv
 import os
 import json
+import hashlib
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 PROJECT_ROOT = os.path.dirname(BASE_DIR)
@@ -14,6 +15,20 @@ class Config:
     LLM_PROVIDER = os.getenv("LLM_PROVIDER")
     WEB_SEARCH_ENABLED = os.getenv("WEB_SEARCH_ENABLED")
     LLM_API_KEY = os.getenv("LLM_API_KEY")
+    LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # e.g. a local OpenAI/Anthropic-compatible stand-in server
+
+    # LLM_PROVIDER=router: route between these providers, each with <PROVIDER>_API_KEY/_MODEL/_BASE_URL
+    ROUTER_PROVIDERS = [p.strip().lower() for p in os.getenv("ROUTER_PROVIDERS", "").split(",") if p.strip()]
+    ROUTER_ROUTES = {
+        p: {
+            "api_key": os.getenv(f"{p.upper()}_API_KEY"),
+            "model": os.getenv(f"{p.upper()}_MODEL"),
+            "base_url": os.getenv(f"{p.upper()}_BASE_URL"),
+        }
+        for p in ROUTER_PROVIDERS
+    }
+    ROUTER_HEDGE_AFTER = float(os.getenv("ROUTER_HEDGE_AFTER", 0))  # seconds without a first chunk; 0 disables hedging
+    ROUTER_EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", 0.05))
     WEB_SEARCH_API_KEY = os.getenv("WEB_SEARCH_API_KEY")
     CSE_ID = os.getenv("CSE_ID")
 
@@ -26,6 +41,15 @@ class Config:
     UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads/")
     DATA_DIR = os.getenv("DATA_DIR", "source_files/")
     INDEX_DIR = os.getenv("INDEX_DIR", "index_storage/")
+    WEB_FETCH_CACHE_DIR = os.getenv("WEB_FETCH_CACHE_DIR", "web_cache/")
+
+    # Tracing: sampled spans exported to a JSONL file or an OTLP/HTTP collector
+    TRACE_ENABLED = os.getenv("TRACE_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.05))
+    TRACE_MAX_TRACES_PER_SEC = int(os.getenv("TRACE_MAX_TRACES_PER_SEC", 20))
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl").lower()
+    TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+    TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
     # Load admin_config.json for other settings
     try:
         with open(ADMIN_CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -41,12 +65,98 @@ class Config:
         STREAM = True
 
         HTTP_TIMEOUT = 10
+        DISCONNECT_POLL_INTERVAL = 0.5  # seconds between client-disconnect checks while streaming
+        SSE_RELAY_QUEUE_SIZE = 64
+        # Content deltas are coalesced into one SSE frame until either limit is reached
+        SSE_FLUSH_MAX_BYTES = int(os.getenv("SSE_FLUSH_MAX_BYTES", 512))
+        SSE_FLUSH_MAX_MS = float(os.getenv("SSE_FLUSH_MAX_MS", 30))
         WEB_SEARCH_NUM_RESULTS = 5
+        WEB_SEARCH_CACHE_TTL = int(os.getenv("WEB_SEARCH_CACHE_TTL", 600))  # seconds; 0 disables the cache
+        WEB_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("WEB_SEARCH_CACHE_MAX_ENTRIES", 2048))
+        # Search-and-read: "off", "auto" (model opts in via read_pages) or "always"
+        WEB_SEARCH_READ_MODE = os.getenv("WEB_SEARCH_READ_MODE", "auto").lower()
+        WEB_READ_TOP_N = int(os.getenv("WEB_READ_TOP_N", 3))
+        WEB_READ_URL_TIMEOUT = float(os.getenv("WEB_READ_URL_TIMEOUT", 8))
+        WEB_READ_DEADLINE = float(os.getenv("WEB_READ_DEADLINE", 12))
+        WEB_READ_MAX_PASSAGES = int(os.getenv("WEB_READ_MAX_PASSAGES", 6))
+        WEB_READ_PASSAGE_CHARS = 800
+        WEB_CONTENT_TOP_K = int(os.getenv("WEB_CONTENT_TOP_K", 4))
+        WEB_CONTENT_MIN_CHARS = int(os.getenv("WEB_CONTENT_MIN_CHARS", 4000))  # shorter pages are passed through whole
+        WEB_FETCH_CACHE_ENABLED = os.getenv("WEB_FETCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+        WEB_FETCH_CACHE_MAX_BYTES = int(os.getenv("WEB_FETCH_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+        WEB_FETCH_CACHE_DEFAULT_TTL = int(os.getenv("WEB_FETCH_CACHE_DEFAULT_TTL", 300))  # seconds, used when no freshness headers
+
+        # Semantic answer cache for first-turn questions without uploads
+        ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+        ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))  # cosine similarity
+        ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 3600))
+        ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2000))
+        # Share one generation among identical concurrent first-turn questions
+        COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+        # Identifies the admin settings that shape answers (model params, RAG, tone)
+        ADMIN_CONFIG_HASH = hashlib.sha256(json.dumps(admin_config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
         CHUNK_SIZE = admin_config["rag"]["chunk_size"]
         CHUNK_OVERLAP = admin_config["rag"]["chunk_overlap"]
         TOP_K = admin_config["rag"]["top_k"]
 
         MAX_CONVERSATION_TURNS = admin_config["max_conversation_turns"]
+        # In-memory history store bounds: messages kept per session, idle expiry (seconds),
+        # and the session count / approximate bytes beyond which least recently used sessions are evicted
+        HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", 200))
+        HISTORY_SESSION_TTL = float(os.getenv("HISTORY_SESSION_TTL", 7200))
+        HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", 10000))
+        HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", 256 * 1024 * 1024))
+        # Prompt tokens of history sent with each question; 0 keeps the last MAX_CONVERSATION_TURNS messages instead
+        HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 6000))
+        # Background compaction: past TRIGGER tokens of stored history, all but the newest KEEP tokens
+        # of turns are folded into a summary of at most SUMMARY tokens
+        COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+        COMPACTION_TRIGGER_TOKENS = int(os.getenv("COMPACTION_TRIGGER_TOKENS", 4000))
+        COMPACTION_KEEP_TOKENS = int(os.getenv("COMPACTION_KEEP_TOKENS", 1500))
+        COMPACTION_SUMMARY_TOKENS = int(os.getenv("COMPACTION_SUMMARY_TOKENS", 500))
+
+        # Per-stage timeouts (seconds) for the work done before the first LLM call
+        STAGE_TIMEOUTS = {"history": 2, "files": 20, "embed": 4, "rag": 8}
+
+        # Token budgets for tool results: what the follow-up call sees vs. what is kept in history
+        TOOL_RESULT_TOKEN_LIMITS = {"web_search": 1500, "web_fetch": 3000, "analyze_data": 1500}
+        TOOL_RESULT_DEFAULT_TOKEN_LIMIT = 2000
+        TOOL_TIMEOUTS = {"web_search": 15, "web_fetch": 30, "analyze_data": 120}  # seconds per call
+        TOOL_DEFAULT_TIMEOUT = 30
+        TOOL_MAX_ROUNDS = int(os.getenv("TOOL_MAX_ROUNDS", 3))
+        TOOL_LOOP_BUDGET = float(os.getenv("TOOL_LOOP_BUDGET", 90))  # wall-clock seconds for all tool rounds
+        TOOL_ROUND_CONCURRENCY = int(os.getenv("TOOL_ROUND_CONCURRENCY", 4))
+        TOOL_RESULT_HISTORY_TOKENS = int(os.getenv("TOOL_RESULT_HISTORY_TOKENS", 400))
+
+        # Admission control for LLM calls: concurrent provider calls, waiters, and max queue wait per priority
+        LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+        LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 64))
+        LLM_QUEUE_TIMEOUTS = {"interactive": 10, "codegen": 30, "batch": 120}  # seconds
+
+        # Retries (with jittered exponential backoff) for retryable LLM, web search and web fetch failures
+        RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 3))
+        RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))  # seconds
+        RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 8))  # seconds; a longer Retry-After is not waited out
+        # Circuit breakers: consecutive failures before failing fast, and seconds until a probe call
+        BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+        BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", 30))
+
+        # Startup warm-up run before /readyz reports ready: any of embedding, llm, sandbox
+        WARMUP_STEPS = [s.strip() for s in os.getenv("WARMUP_STEPS", "embedding,llm,sandbox").split(",") if s.strip()]
+        WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 120))  # seconds per step
+        # Idle provider connections are kept this long so warm-up (and traffic gaps) don't cost a new TLS handshake
+        LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+        # Pre-started code-execution interpreters, with these modules already imported
+        SANDBOX_POOL_SIZE = int(os.getenv("SANDBOX_POOL_SIZE", 2))
+        SANDBOX_PRELOAD_MODULES = [m.strip() for m in os.getenv("SANDBOX_PRELOAD_MODULES", "pandas,numpy,sklearn").split(",") if m.strip()]
+
+        # Batch chat API: off by default; when on, callers must send BATCH_API_KEY as a bearer token
+        BATCH_ENABLED = os.getenv("BATCH_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+        BATCH_API_KEY = os.getenv("BATCH_API_KEY")
+        # Questions per request, concurrent LLM calls, RAG embedding batch size
+        BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+        BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+        BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", 64))
         
         EMBEDDING_DIM = 1024  # Dimension for BGE-2.0 models
         EMBEDDING_MODEL_NAME = "BAAI/bge-large-en-v1.5"
@@ -0,0 +1,81 @@
+"""Prometheus metrics for the chat service.
+
+Works with several uvicorn/gunicorn workers when PROMETHEUS_MULTIPROC_DIR is
+set (to an empty directory, before the workers start): every worker then
+writes its samples to that directory and /metrics aggregates them.
+"""
+import asyncio
+import os
+import time
+import tracemalloc
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+from app import logger
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+REQUESTS = Counter("chatpilot_requests_total", "Chat requests by endpoint and HTTP status", ["endpoint", "status"])
+IN_FLIGHT = Gauge("chatpilot_requests_in_flight", "Responses currently streaming", multiprocess_mode="livesum")
+TIME_TO_FIRST_TOKEN = Histogram("chatpilot_time_to_first_token_seconds", "Request start to first streamed token", buckets=LATENCY_BUCKETS)
+RESPONSE_LATENCY = Histogram("chatpilot_response_seconds", "Total time to produce a full response", buckets=LATENCY_BUCKETS)
+RAG_LATENCY = Histogram("chatpilot_rag_seconds", "RAG retrieval latency", buckets=LATENCY_BUCKETS)
+TOOL_LATENCY = Histogram("chatpilot_tool_seconds", "Tool call latency by tool", ["tool"], buckets=LATENCY_BUCKETS)
+SANDBOX_RUN = Histogram("chatpilot_sandbox_run_seconds", "Sandboxed code execution time", buckets=LATENCY_BUCKETS)
+PROVIDER_ERRORS = Counter("chatpilot_provider_errors_total", "LLM provider errors by engine (by route under the router)", ["engine"])
+LLM_ROUTE_EVENTS = Counter("chatpilot_llm_route_events_total", "Router decisions by provider (selected, hedge, failover, won, error)", ["provider", "event"])
+LLM_TOKENS = Counter("chatpilot_llm_tokens_total", "LLM tokens by kind (input, cached input, cache write, output)", ["kind"])
+CACHE_REQUESTS = Counter("chatpilot_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+HISTORY_SESSIONS = Gauge("chatpilot_history_sessions", "Sessions held in the history store", multiprocess_mode="livesum")
+HISTORY_MESSAGES = Gauge("chatpilot_history_messages", "Messages held in the history store", multiprocess_mode="livesum")
+HISTORY_BYTES = Gauge("chatpilot_history_bytes", "Approximate bytes of message text in the history store", multiprocess_mode="livesum")
+HISTORY_EVICTIONS = Counter("chatpilot_history_evictions_total", "History sessions evicted by reason (idle, lru)", ["reason"])
+HISTORY_COMPACTIONS = Counter("chatpilot_history_compactions_total", "Background history compactions by result", ["result"])
+LLM_ACTIVE = Gauge("chatpilot_llm_active_calls", "LLM calls holding an admission slot", multiprocess_mode="livesum")
+ADMISSION_QUEUED = Gauge("chatpilot_admission_queued", "LLM calls waiting for an admission slot", multiprocess_mode="livesum")
+ADMISSION_WAIT = Histogram("chatpilot_admission_wait_seconds", "Time spent queued for an LLM slot by priority", ["priority"], buckets=LATENCY_BUCKETS)
+ADMISSION_REJECTED = Counter("chatpilot_admission_rejected_total", "LLM calls shed by priority and reason", ["priority", "reason"])
+RETRIES = Counter("chatpilot_retries_total", "Retried calls by dependency", ["dependency"])
+CIRCUIT_EVENTS = Counter("chatpilot_circuit_events_total", "Circuit breaker transitions and fast-fail rejections by dependency", ["dependency", "event"])
+EVENT_LOOP_LAG = Gauge("chatpilot_event_loop_lag_seconds", "Event loop scheduling delay", multiprocess_mode="livemax")
+TRACED_MEMORY = Gauge("chatpilot_traced_memory_bytes", "Memory traced by tracemalloc", multiprocess_mode="livesum")
+
+
+def render_metrics() -> tuple:
+    """Return (body, content_type) for the /metrics endpoint."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def observe_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+async def run_runtime_monitor(history_store, interval: float = 1.0):
+    """Sample event-loop lag, history store size and traced memory until cancelled."""
+    while True:
+        started = time.monotonic()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(0.0, time.monotonic() - started - interval))
+        try:
+            stats = history_store.stats()
+            HISTORY_SESSIONS.set(stats.get("sessions", 0))
+            HISTORY_MESSAGES.set(stats.get("messages", 0))
+            HISTORY_BYTES.set(stats.get("bytes", 0))
+            if tracemalloc.is_tracing():
+                TRACED_MEMORY.set(tracemalloc.get_traced_memory()[0])
+        except Exception as e:
+            logger.error(f"Runtime metrics sampling failed: {e}")
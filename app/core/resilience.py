@@ -0,0 +1,236 @@
+"""Retries and circuit breaking for calls to external dependencies.
+
+Retryable failures (connection errors, timeouts, 408/409/429/5xx) are retried
+with full-jitter exponential backoff, waiting at least as long as the
+dependency's Retry-After. Streams are only retried before their first chunk,
+so nothing the user has already seen is ever repeated.
+
+Each dependency ("llm", "web_search", "web_fetch:<host>") has a circuit
+breaker: after `BREAKER_FAILURE_THRESHOLD` consecutive retryable failures it
+opens and calls fail fast with `CircuitOpenError` for
+`BREAKER_RECOVERY_TIMEOUT` seconds, after which a single probe call decides
+whether it closes again. A dependency that is down costs one quick error per
+request instead of a pile-up of slow timeouts and retries.
+"""
+import asyncio
+import math
+import random
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import AsyncGenerator, Awaitable, Callable, Optional
+
+import httpx
+
+from app import logger
+from app.core import metrics
+from app.core.config import Config
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# SDK errors without a status code (openai and anthropic share these names)
+_RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"{name} is temporarily unavailable, retry after {retry_after}s")
+        self.name = name
+        self.reason = "circuit_open"
+        self.retry_after = retry_after
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """True for failures a later attempt may not hit: transport errors, timeouts, throttling, 5xx."""
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(exc).__name__ in _RETRYABLE_ERRORS
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """The Retry-After the dependency sent with this error, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based), never sooner than Retry-After."""
+    delay = random.uniform(0, min(Config.RETRY_MAX_DELAY, Config.RETRY_BASE_DELAY * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.dependency = name.split(":", 1)[0]
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _event(self, event: str):
+        metrics.CIRCUIT_EVENTS.labels(dependency=self.dependency, event=event).inc()
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.opened_at + self.recovery_timeout - time.monotonic()))
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "open" or (self.state == "half_open" and self._probing):
+            self._event("rejected")
+            raise CircuitOpenError(self.name, self.retry_after())
+        if self.state == "half_open":
+            # Let exactly one call through to find out whether the dependency is back
+            self._probing = True
+
+    def fail_fast(self):
+        """Raise CircuitOpenError while the circuit is open, without taking the probe slot."""
+        if self.state == "open" and time.monotonic() - self.opened_at < self.recovery_timeout:
+            self._event("rejected")
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"Circuit {self.name} closed")
+            self._event("closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+            self._event("opened")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """The call ended without telling us anything (e.g. cancelled): free the probe slot."""
+        self._probing = False
+
+    def record(self, exc: BaseException):
+        """Count a failed call; errors the dependency answered deliberately (4xx) show it is up."""
+        if is_retryable(exc):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+_breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+# Per-host web_fetch breakers would otherwise grow without bound
+_MAX_BREAKERS = 1024
+
+
+def breaker(name: str) -> CircuitBreaker:
+    """The process-wide circuit breaker for dependency `name`."""
+    cb = _breakers.get(name)
+    if cb is None:
+        cb = CircuitBreaker(name, Config.BREAKER_FAILURE_THRESHOLD, Config.BREAKER_RECOVERY_TIMEOUT)
+        _breakers[name] = cb
+        while len(_breakers) > _MAX_BREAKERS:
+            _breakers.popitem(last=False)
+    else:
+        _breakers.move_to_end(name)
+    return cb
+
+
+async def _before_retry(cb: CircuitBreaker, exc: Exception, attempt: int, attempts: int):
+    """Re-raise `exc` if it should not be retried; otherwise sleep out the backoff."""
+    if not is_retryable(exc) or attempt == attempts - 1 or cb.state == "open":
+        raise exc
+    delay = backoff_delay(attempt, retry_after_seconds(exc))
+    if delay > Config.RETRY_MAX_DELAY:
+        # Asked to come back later than we are willing to keep the caller waiting
+        raise exc
+    metrics.RETRIES.labels(dependency=cb.dependency).inc()
+    logger.warning(f"{cb.name} call failed ({type(exc).__name__}: {exc}), retry {attempt + 1}/{attempts - 1} in {delay:.2f}s")
+    await asyncio.sleep(delay)
+
+
+async def retry_call(call: Callable[[], Awaitable], name: str, attempts: int = None):
+    """Await `call()` behind the `name` circuit breaker, retrying retryable failures."""
+    cb = breaker(name)
+    attempts = max(1, attempts or Config.RETRY_MAX_ATTEMPTS)
+    for attempt in range(attempts):
+        cb.check()
+        try:
+            result = await call()
+        except (asyncio.CancelledError, CircuitOpenError):
+            # Cancelled, or refused by a narrower breaker inside the call: nothing learned about `name`
+            cb.release()
+            raise
+        except Exception as e:
+            cb.record(e)
+            await _before_retry(cb, e, attempt, attempts)
+            continue
+        cb.record_success()
+        return result
+
+
+async def resilient_stream(factory: Callable[[], AsyncGenerator], name: str, attempts: int = None) -> AsyncGenerator:
+    """Relay the stream `factory()` returns, starting it again on a retryable failure before its first chunk.
+
+    Once a chunk has been relayed a failure is raised as is: the caller has
+    already shown part of the answer and a retry would repeat it.
+    """
+    cb = breaker(name)
+    attempts = max(1, attempts or Config.RETRY_MAX_ATTEMPTS)
+    stream = None
+    for attempt in range(attempts):
+        cb.check()
+        stream = factory()
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            cb.record_success()
+            return
+        except (asyncio.CancelledError, CircuitOpenError):
+            cb.release()
+            await stream.aclose()
+            raise
+        except Exception as e:
+            await stream.aclose()
+            cb.record(e)
+            await _before_retry(cb, e, attempt, attempts)
+            continue
+        cb.record_success()
+        break
+
+    try:
+        yield first
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await stream.aclose()
@@ -0,0 +1,147 @@
+"""Server-sent event framing for the chat stream."""
+import asyncio
+import json
+import time
+from io import StringIO
+from typing import AsyncIterator, Optional
+
+from app.core.config import Config
+
+try:
+    import orjson
+except ImportError:  # listed in requirements.txt; fall back to json if missing
+    orjson = None
+
+
+def encode_json(payload) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload).decode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def sse_frame(payload) -> str:
+    return f"data: {encode_json(payload)}\n\n"
+
+
+def streamed_content(frames: list) -> str:
+    """The answer text carried by already-encoded frames (the content events, in order)."""
+    parts = []
+    for frame in frames:
+        for event in frame.split("\n\n"):
+            if event.startswith("data: "):
+                payload = json.loads(event[len("data: "):])
+                if isinstance(payload.get("content"), str):
+                    parts.append(payload["content"])
+    return "".join(parts)
+
+
+# Constant frames are encoded once at import time
+STATUS_SEARCHING_FRAME = sse_frame({"status": "Searching knowledge base..."})
+END_FRAME = sse_frame({"end": True})
+ERROR_FRAME = sse_frame({"error": "An error occurred"})
+
+
+class SSEWriter:
+    """Coalesce streamed content deltas into fewer, larger SSE frames.
+
+    Providers emit a delta every one or two tokens; sending each as its own
+    frame costs a JSON encode, an ASGI send and a TCP write. Deltas are
+    buffered until `max_bytes` or `max_ms` is exceeded. The first delta is
+    always sent immediately so time-to-first-token is unaffected, and any
+    other event flushes pending content ahead of itself to keep ordering.
+    Read the provider stream through `paced()` so buffered content still goes
+    out after `max_ms` when the provider stalls.
+    """
+
+    def __init__(self, max_bytes: int = Config.SSE_FLUSH_MAX_BYTES, max_ms: float = Config.SSE_FLUSH_MAX_MS):
+        self.max_bytes = max_bytes
+        self.max_seconds = max_ms / 1000
+        self._pending = StringIO()
+        self._pending_bytes = 0
+        self._pending_since = None
+        self._sent_content = False
+        self.frames = 0
+        self.bytes = 0
+
+    def _emit(self, frame: str) -> str:
+        self.frames += 1
+        self.bytes += len(frame)
+        return frame
+
+    def content(self, text: str) -> Optional[str]:
+        """Buffer a content delta; returns a frame when it is time to flush, else None."""
+        if not self._sent_content:
+            self._sent_content = True
+            return self._emit(sse_frame({"content": text}))
+
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        self._pending.write(text)
+        self._pending_bytes += len(text)
+        if self._pending_bytes >= self.max_bytes or time.monotonic() - self._pending_since >= self.max_seconds:
+            return self.flush()
+        return None
+
+    def due_in(self) -> Optional[float]:
+        """Seconds until buffered content must be flushed, or None if nothing is pending."""
+        if self._pending_since is None:
+            return None
+        return max(0.0, self._pending_since + self.max_seconds - time.monotonic())
+
+    async def paced(self, stream: AsyncIterator) -> AsyncIterator:
+        """Relay `stream`, yielding None whenever buffered content falls due before its next item.
+
+        The caller answers None with `flush()`. The next item is awaited in a
+        task that outlives the timeout, so a slow provider is never cancelled;
+        close this generator before closing `stream`.
+        """
+        iterator = stream.__aiter__()
+        next_item = None
+        try:
+            while True:
+                due = self.due_in()
+                if next_item is None and due is None:
+                    try:
+                        item = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    yield item
+                    continue
+                if next_item is None:
+                    next_item = asyncio.ensure_future(iterator.__anext__())
+                if due is not None:
+                    done, _ = await asyncio.wait({next_item}, timeout=due)
+                    if not done:
+                        yield None
+                        continue
+                try:
+                    item = await next_item
+                except StopAsyncIteration:
+                    return
+                finally:
+                    if next_item.done():
+                        next_item = None
+                yield item
+        finally:
+            if next_item is not None:
+                next_item.cancel()
+                await asyncio.gather(next_item, return_exceptions=True)
+
+    def flush(self) -> Optional[str]:
+        """Return a frame with all buffered content, or None if nothing is pending."""
+        if not self._pending_bytes:
+            return None
+        text = self._pending.getvalue()
+        self._pending = StringIO()
+        self._pending_bytes = 0
+        self._pending_since = None
+        return self._emit(sse_frame({"content": text}))
+
+    def event(self, payload) -> str:
+        """Encode a non-content event, preceded by any buffered content."""
+        return self.frame(sse_frame(payload))
+
+    def frame(self, frame: str) -> str:
+        """Send a pre-encoded frame, preceded by any buffered content."""
+        pending = self.flush()
+        return (pending or "") + self._emit(frame)
@@ -0,0 +1,55 @@
+"""Per-request stage timings for the chat pipeline."""
+import json
+import time
+from contextlib import contextmanager
+
+
+class RequestTimer:
+    """Record monotonic durations for named stages of one request.
+
+    Repeated stages (e.g. a tool called in two rounds) accumulate. `mark`
+    records an offset from the start of the request the first time it is
+    called, which is how time-to-first-token is captured.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+        self.marks = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - started)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def mark(self, name: str):
+        if name not in self.marks:
+            self.marks[name] = time.monotonic() - self.started
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def as_dict(self) -> dict:
+        """Durations in milliseconds, including `total` up to now."""
+        timings = {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()}
+        timings.update({name: round(seconds * 1000, 1) for name, seconds in self.marks.items()})
+        timings["total"] = round(self.elapsed() * 1000, 1)
+        return timings
+
+    def server_timing(self) -> str:
+        """Format recorded stages as a Server-Timing header value."""
+        parts = []
+        for name, ms in self.as_dict().items():
+            metric = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+            parts.append(f"{metric};dur={ms}")
+        return ", ".join(parts)
+
+    def log_line(self, **fields) -> str:
+        """One structured (JSON) log line with the timings and any extra fields."""
+        return json.dumps({"event": "chat_timings", **fields, "timings_ms": self.as_dict()}, default=str)
@@ -0,0 +1,247 @@
+"""Lightweight tracing spans for the chat pipeline.
+
+    with tracing.span("rag.retrieve", top_k=3) as s:
+        ...
+        s.set_attribute("chunks", len(chunks))
+
+When tracing is disabled, `span()` returns a shared no-op object, so
+instrumented code pays one flag check. The sampling decision is made once per
+trace, at the root span (ratio-based, with a cap on traces per second);
+children of an unsampled root are no-ops too. The current span lives in a
+contextvar, so it follows asyncio tasks and `asyncio.to_thread`; use
+`run_in_executor` for explicit executors. Finished spans go through a bounded
+queue to a background thread that writes JSONL or posts OTLP/JSON, and spans
+are dropped rather than blocking when that queue is full.
+"""
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+
+from app import logger
+from app.core.config import Config
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("chatpilot_span", default=None)
+
+
+class _NoopSpan:
+    sampled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, exc: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _NoopScope(_NoopSpan):
+    """An unsampled root: marks the context so descendants skip sampling too."""
+
+    def __enter__(self):
+        self._token = _current_span.set(NOOP_SPAN)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited from another context (e.g. an async generator finalizer)
+            pass
+        return False
+
+
+class Span:
+    sampled = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, exc: BaseException):
+        """Mark the span failed for an exception that was handled rather than raised through it."""
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            pass
+        _tracer.export(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Tracer:
+    def __init__(self):
+        self.enabled = Config.TRACE_ENABLED
+        self.sample_rate = Config.TRACE_SAMPLE_RATE
+        self.max_traces_per_sec = Config.TRACE_MAX_TRACES_PER_SEC
+        self._window = 0
+        self._window_count = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=10000)
+        self._worker = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def should_sample(self) -> bool:
+        if random.random() >= self.sample_rate:
+            return False
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window, self._window_count = now, 0
+            if self._window_count >= self.max_traces_per_sec:
+                return False
+            self._window_count += 1
+        return True
+
+    def export(self, span: Span):
+        if self._worker is None:
+            self._start_worker()
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is None:
+                exporter = OTLPExporter(Config.TRACE_OTLP_ENDPOINT) if Config.TRACE_EXPORTER == "otlp" else JSONLExporter(Config.TRACE_FILE)
+                self._worker = threading.Thread(target=self._run, args=(exporter,), name="span-exporter", daemon=True)
+                self._worker.start()
+
+    def _run(self, exporter):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < 512:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.error(f"Span export failed ({len(batch)} spans dropped): {e}")
+            time.sleep(0.2)
+
+
+class JSONLExporter:
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: list):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s, default=str) + "\n")
+
+
+class OTLPExporter:
+    """Post spans to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=5)
+
+    @staticmethod
+    def _attr(key, value) -> dict:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def export(self, spans: list):
+        otlp_spans = []
+        for s in spans:
+            otlp_span = {
+                "traceId": s["trace_id"],
+                "spanId": s["span_id"],
+                "name": s["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(s["start_ns"]),
+                "endTimeUnixNano": str(s["start_ns"] + int(s["duration_ms"] * 1e6)),
+                "attributes": [self._attr(k, v) for k, v in s["attributes"].items()],
+                "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+            }
+            if s["parent_id"]:
+                otlp_span["parentSpanId"] = s["parent_id"]
+            otlp_spans.append(otlp_span)
+
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [self._attr("service.name", "chatpilot")]},
+            "scopeSpans": [{"scope": {"name": "chatpilot"}, "spans": otlp_spans}],
+        }]}
+        self.client.post(self.endpoint, json=payload).raise_for_status()
+
+
+_tracer = _Tracer()
+
+
+def span(name: str, **attributes):
+    """Start a span as a child of the current one, or a new (possibly sampled) trace."""
+    if not _tracer.enabled:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    if parent is None:
+        if not _tracer.should_sample():
+            return _NoopScope()
+        return Span(name, os.urandom(16).hex(), None, attributes)
+    if not parent.sampled:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+async def run_in_executor(loop, executor, fn, *args):
+    """`loop.run_in_executor` that carries the current span into the worker thread."""
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, ctx.run, fn, *args)
@@ -0,0 +1,46 @@
+"""Startup warm-up and the readiness state behind `/readyz`.
+
+Warm-up steps (first embedding forward pass, provider connection, sandbox
+interpreters) run concurrently in the background once the app has started;
+the worker reports ready only when all of them have finished, so a load
+balancer keeps traffic away from it while it is still cold.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict
+
+from app import logger
+
+
+class Readiness:
+    def __init__(self):
+        self.steps: Dict[str, dict] = {}
+        self.warmed = False
+
+    @property
+    def ready(self) -> bool:
+        return self.warmed
+
+    def as_dict(self) -> dict:
+        status = "ready" if self.warmed else "warming"
+        return {"status": status, "steps": self.steps}
+
+
+async def _run_step(readiness: Readiness, name: str, step: Callable[[], Awaitable], timeout: float):
+    readiness.steps[name] = {"status": "running"}
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(step(), timeout)
+        readiness.steps[name] = {"status": "ok"}
+    except Exception as e:
+        # A failed step leaves that part cold but must not keep the worker out of rotation forever
+        logger.error(f"Warm-up step {name} failed: {e}", exc_info=True)
+        readiness.steps[name] = {"status": "failed", "error": str(e) or type(e).__name__}
+    readiness.steps[name]["seconds"] = round(time.monotonic() - started, 3)
+
+
+async def run_warmup(readiness: Readiness, steps: Dict[str, Callable[[], Awaitable]], timeout: float):
+    """Run the warm-up `steps` concurrently, then mark the worker ready."""
+    await asyncio.gather(*(_run_step(readiness, name, step, timeout) for name, step in steps.items()))
+    readiness.warmed = True
+    logger.info(f"Warm-up finished: {readiness.steps}")
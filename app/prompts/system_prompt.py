@@ -8,11 +8,7 @@ system_prompt = """
                 - Always use them internally to understand the user's needs.  
                 - Never mention, quote, or hint that they exist.  
                 - Rephrase or summarize relevant details naturally into your answer without revealing their source.
-
-                '''
-                CONTEXT
-                {context}
-                '''
+                - Knowledge-base context for the current question is given in a CONTEXT message after the conversation history.
 
                 OUTPUT STRUCTURE  
                 Keep it brief and scannable. Use bullet points, short paragraphs, and get to the point immediately.
@@ -1,18 +1,24 @@
 # app/routes/chatbot_routes.py
+import hmac
 import os
 import shutil
 from fastapi import Request
 from fastapi.routing import APIRouter
 from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from slowapi.errors import RateLimitExceeded
-from starlette.status import HTTP_429_TOO_MANY_REQUESTS
+from starlette.status import HTTP_401_UNAUTHORIZED, HTTP_404_NOT_FOUND, HTTP_429_TOO_MANY_REQUESTS, HTTP_503_SERVICE_UNAVAILABLE
 from app import limiter, logger
 from app.core.config import Config
 from pydantic import ValidationError
-from app.schemas.schemas import ChatRequest
+from app.schemas.schemas import ChatRequest, BatchChatRequest
 import asyncio
 import uuid
 from app.services.chatbot_service import ChatbotService
+from app.services.batch_service import BatchChatService
+from app.core.timing import RequestTimer
+from app.core.metrics import IN_FLIGHT
+from app.core.admission import AdmissionRejected, Priority, admission
+from app.core.resilience import CircuitOpenError, breaker
 
 chatbot_bp = APIRouter()
 
@@ -21,13 +27,87 @@ def _rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     return PlainTextResponse("Rate limit exceeded", status_code=HTTP_429_TOO_MANY_REQUESTS)
 
 
-def init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, history_store, code_executor):
+def _batch_token_valid(request: Request) -> bool:
+    """True if the request carries BATCH_API_KEY (as `Authorization: Bearer <key>` or `X-API-Key`)."""
+    auth = request.headers.get("Authorization", "")
+    token = auth[len("bearer "):] if auth.lower().startswith("bearer ") else request.headers.get("X-API-Key", "")
+    return bool(token) and hmac.compare_digest(token.encode("utf-8"), Config.BATCH_API_KEY.encode("utf-8"))
+
+
+def _overloaded_response(exc):
+    """503 with Retry-After for a shed request (AdmissionRejected) or an unavailable LLM (CircuitOpenError)."""
+    if isinstance(exc, CircuitOpenError):
+        message = "The assistant is temporarily unavailable, please try again shortly."
+    else:
+        message = "The server is busy, please try again shortly."
+    return JSONResponse(
+        content={"error": message, "retry_after": exc.retry_after},
+        status_code=HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+_STREAM_DONE = object()
+
+
+async def _relay(source, queue: asyncio.Queue):
+    try:
+        async for chunk in source:
+            await queue.put(chunk)
+    except Exception as e:
+        logger.error(f"Response stream failed: {e}", exc_info=True)
+    finally:
+        await source.aclose()
+    await queue.put(_STREAM_DONE)
+
+
+async def _watch_disconnect(request: Request, producer: asyncio.Task, queue: asyncio.Queue):
+    while not producer.done():
+        await asyncio.sleep(Config.DISCONNECT_POLL_INTERVAL)
+        if await request.is_disconnected():
+            logger.info("Client disconnected, cancelling response generation")
+            producer.cancel()
+            try:
+                queue.put_nowait(_STREAM_DONE)
+            except asyncio.QueueFull:
+                pass
+            return
+
+
+async def stream_until_disconnect(request: Request, source):
+    """Relay `source` to the client, cancelling it as soon as the client disconnects.
+
+    Generation runs in its own task so that cancellation reaches whatever it is
+    awaiting (provider stream, tools, sandbox) rather than only the next chunk.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=Config.SSE_RELAY_QUEUE_SIZE)
+    producer = asyncio.create_task(_relay(source, queue))
+    watcher = asyncio.create_task(_watch_disconnect(request, producer, queue))
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is _STREAM_DONE:
+                break
+            yield chunk
+    finally:
+        watcher.cancel()
+        if not producer.done():
+            producer.cancel()
+        # Let the generator finish its cancellation cleanup (history, subprocesses)
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+def init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, history_store, code_executor, answer_cache=None, fanout=None, compactor=None, tool_executor=None, tool_budget=None):
 
     @chatbot_bp.post('/api/chat', response_class=StreamingResponse)
     @limiter.limit("10/minute")
     async def get_bot_response(request: Request):
         session_upload_dir = None  # For cleanup tracking
+        timer = RequestTimer()
         try:
+            # Shed before reading uploads or opening a stream when the LLM queue is already full
+            admission.check(Priority.INTERACTIVE)
+            breaker("llm").fail_fast()
             
             session_id = (
                 request.headers.get('X-Session-ID') or
@@ -85,14 +165,16 @@ def init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service,
             if not question:
                 raise ValueError("Question field is required.")
             
-            chatbot_service = ChatbotService(llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, store=history_store, session_id=session_id, code_executor=code_executor)
+            timer.add("parse", timer.elapsed())
+            chatbot_service = ChatbotService(llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, store=history_store, session_id=session_id, code_executor=code_executor, timer=timer, answer_cache=answer_cache, fanout=fanout, compactor=compactor, tool_executor=tool_executor, tool_budget=tool_budget)
 
             async def event_stream():
+                IN_FLIGHT.inc()
                 try:
-                    async for chunk in chatbot_service._generate_response(question, uploaded_files=uploaded_files):
+                    async for chunk in stream_until_disconnect(request, chatbot_service._respond(question, uploaded_files=uploaded_files)):
                         yield chunk
                 finally:
-                    
+                    IN_FLIGHT.dec()
                     if session_upload_dir and os.path.exists(session_upload_dir):
                         shutil.rmtree(session_upload_dir)
                         logger.info(f"Cleaned: {session_upload_dir}")
@@ -101,8 +183,13 @@ def init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service,
                     'Cache-Control': 'no-cache',
                     'Connection': 'keep-alive',
                     'X-Session-ID': session_id,
+                    # Only pre-stream stages are known when headers are sent; the rest arrive in the `timings` event
+                    'Server-Timing': timer.server_timing(),
                 })
 
+        except (AdmissionRejected, CircuitOpenError) as ar:
+            logger.warning(f"Chat request shed: {ar}")
+            return _overloaded_response(ar)
         except RuntimeError as re:
             logger.error(f"RuntimeError: {re}")
             return JSONResponse(content={"error": str(re)}, status_code=500)
@@ -121,6 +208,57 @@ def init_chatbot_routes(app, llm_engine, web_search_service, web_fetch_service,
             return JSONResponse(content={"error": "An unexpected error occurred. Please try again later."},
                                 status_code=500)
 
+    batch_service = BatchChatService(llm_engine, rag_service, system_prompt)
+    # Every batch item is a paid LLM call: the endpoint only exists for callers holding the key
+    batch_enabled = Config.BATCH_ENABLED and bool(Config.BATCH_API_KEY)
+    if Config.BATCH_ENABLED and not Config.BATCH_API_KEY:
+        logger.error("BATCH_ENABLED is set but BATCH_API_KEY is not; the batch API stays disabled")
+
+    @chatbot_bp.post('/api/chat/batch', response_class=StreamingResponse)
+    @limiter.limit("2/minute")
+    async def get_batch_response(request: Request):
+        """Answer many questions in one request; streams one JSON result per line."""
+        if not batch_enabled:
+            return JSONResponse(content={"error": "The batch API is disabled"}, status_code=HTTP_404_NOT_FOUND)
+        if not _batch_token_valid(request):
+            return JSONResponse(content={"error": "Invalid or missing API key"}, status_code=HTTP_401_UNAUTHORIZED,
+                                headers={"WWW-Authenticate": "Bearer"})
+        try:
+            admission.check(Priority.BATCH)
+            batch = BatchChatRequest(**(await request.json()))
+            if len(batch.questions) > Config.BATCH_MAX_ITEMS:
+                return JSONResponse(
+                    content={"error": f"Maximum {Config.BATCH_MAX_ITEMS} questions per batch"},
+                    status_code=400
+                )
+            items = [item.model_dump() for item in batch.questions]
+            logger.info(f"Batch request with {len(items)} questions")
+
+            async def result_stream():
+                IN_FLIGHT.inc()
+                try:
+                    async for line in stream_until_disconnect(request, batch_service.run_jsonl(items)):
+                        yield line
+                finally:
+                    IN_FLIGHT.dec()
+
+            return StreamingResponse(result_stream(), media_type='application/x-ndjson', headers={
+                    'Cache-Control': 'no-cache',
+                })
+
+        except AdmissionRejected as ar:
+            logger.warning(f"Batch request shed: {ar}")
+            return _overloaded_response(ar)
+        except ValidationError as ve:
+            return JSONResponse(content={"error": ve.errors()}, status_code=400)
+        except (ValueError, TypeError) as ve:
+            logger.error(f"Invalid batch request: {ve}")
+            return JSONResponse(content={"error": f"Invalid data: {str(ve)}"}, status_code=400)
+        except Exception:
+            logger.exception("Unexpected error:")
+            return JSONResponse(content={"error": "An unexpected error occurred. Please try again later."},
+                                status_code=500)
+
     app.include_router(chatbot_bp)
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
@@ -0,0 +1,21 @@
+from fastapi.routing import APIRouter
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+health_bp = APIRouter()
+
+
+def init_health_routes(app, readiness):
+
+    @health_bp.get('/healthz')
+    async def healthz():
+        """Liveness: the process is up and serving."""
+        return JSONResponse(content={"status": "ok"})
+
+    @health_bp.get('/readyz')
+    async def readyz():
+        """Readiness: warm-up has finished."""
+        status_code = 200 if readiness.ready else HTTP_503_SERVICE_UNAVAILABLE
+        return JSONResponse(content=readiness.as_dict(), status_code=status_code)
+
+    app.include_router(health_bp)
@@ -0,0 +1,41 @@
+from fastapi.routing import APIRouter
+from starlette.responses import Response
+
+from app.core.metrics import REQUESTS, render_metrics
+
+metrics_bp = APIRouter()
+
+
+class RequestMetricsMiddleware:
+    """Count HTTP responses by route and status.
+
+    Plain ASGI (not BaseHTTPMiddleware) so streamed responses and client
+    disconnect detection pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                endpoint = getattr(scope.get("route"), "path", "unmatched")
+                if endpoint not in ("/metrics", "/healthz", "/readyz"):
+                    REQUESTS.labels(endpoint=endpoint, status=str(message["status"])).inc()
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def init_metrics_routes(app):
+
+    @metrics_bp.get('/metrics')
+    async def get_metrics():
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
+    app.include_router(metrics_bp)
+    app.add_middleware(RequestMetricsMiddleware)
@@ -1,7 +1,16 @@
 import re
+from typing import List, Optional
 from pydantic import BaseModel, Field, field_validator
 
 
+def _clean_question(v: str) -> str:
+    v = re.sub(r'<[^>]+>', '', v)  # Remove HTML tags
+    v = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', v)
+    if not v.strip():
+        raise ValueError('Question cannot be empty or whitespace')
+    return v
+
+
 class ChatRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=1000)
     research_mode: bool = False
@@ -9,8 +18,18 @@ class ChatRequest(BaseModel):
     @field_validator('question')
     @classmethod
     def no_empty_or_whitespace(cls, v: str):
-        v = re.sub(r'<[^>]+>', '', v)  # Remove HTML tags
-        v = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', v)
-        if not v.strip():
-            raise ValueError('Question cannot be empty or whitespace')
-        return v
+        return _clean_question(v)
+
+
+class BatchChatItem(BaseModel):
+    id: Optional[str] = None
+    question: str = Field(..., min_length=1, max_length=1000)
+
+    @field_validator('question')
+    @classmethod
+    def no_empty_or_whitespace(cls, v: str):
+        return _clean_question(v)
+
+
+class BatchChatRequest(BaseModel):
+    questions: List[BatchChatItem] = Field(..., min_length=1)
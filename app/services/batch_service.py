@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import AsyncGenerator, List
+
+from app import logger
+from app.core.config import Config
+from app.core import tracing
+from app.core.admission import AdmissionRejected, Priority, admitted
+from app.core.resilience import CircuitOpenError, resilient_stream
+from app.core.sse import encode_json
+from app.services.chatbot_service import build_context_message, build_system_message
+
+config = Config()
+
+_BATCH_DONE = object()
+BATCH_SHED_RETRIES = 5
+
+
+class BatchChatService:
+    """Answer many independent questions for offline/bulk workloads.
+
+    RAG query embeddings are computed in batches of `BATCH_EMBED_SIZE`, and
+    LLM calls run with at most `BATCH_CONCURRENCY` in flight, so throughput is
+    bounded by the provider rather than per-request HTTP overhead. Items are
+    stateless: no history is read or written and tools are disabled.
+    """
+
+    def __init__(self, llm_engine, rag_service, system_prompt: str,
+                 concurrency: int = Config.BATCH_CONCURRENCY, embed_size: int = Config.BATCH_EMBED_SIZE):
+        self.llm_engine = llm_engine
+        self.rag_service = rag_service
+        self.system_prompt = build_system_message(system_prompt)
+        self.concurrency = max(1, concurrency)
+        self.embed_size = max(1, embed_size)
+
+    async def _retrieve(self, questions: List[str]) -> tuple:
+        """Return (context per question, error or None); a RAG failure degrades to no context."""
+        try:
+            return await self.rag_service.get_corpus_data_batch(questions), None
+        except Exception as e:
+            logger.error(f"Batch RAG retrieval failed for {len(questions)} questions: {e}")
+            return [[] for _ in questions], str(e) or type(e).__name__
+
+    async def _answer(self, question: str, context_chunks: list) -> tuple:
+        """Return (answer, ttft_ms, usage) for one question."""
+        started = time.monotonic()
+        ttft_ms = None
+        usage = None
+        parts = []
+        context = build_context_message(context_chunks)
+        response = resilient_stream(lambda: self.llm_engine.stream_response(
+            messages=[{"role": "user", "content": question}],
+            system_prompt=self.system_prompt,
+            context=context,
+            tool_choice="none",
+            model=config.MODEL_NAME,
+            top_p=config.TOP_P,
+            max_completion_tokens=config.MAX_TOKENS,
+            temperature=config.TEMPERATURE,
+            stream=config.STREAM,
+        ), "llm", attempts=self.llm_engine.retry_attempts)
+        stream = admitted(response, Priority.BATCH)
+        try:
+            async for chunk in stream:
+                if chunk.get("type") == "usage":
+                    usage = chunk["usage"]
+                elif chunk.get("type") == "delta" and chunk.get("content"):
+                    if ttft_ms is None:
+                        ttft_ms = round((time.monotonic() - started) * 1000, 1)
+                    parts.append(chunk["content"])
+        finally:
+            await stream.aclose()
+        return "".join(parts), ttft_ms, usage
+
+    async def _answer_admitted(self, question: str, context_chunks: list) -> tuple:
+        """`_answer`, waiting out load shedding and open circuits: batch work yields rather than failing."""
+        for attempt in range(BATCH_SHED_RETRIES):
+            try:
+                return await self._answer(question, context_chunks)
+            except (AdmissionRejected, CircuitOpenError) as e:
+                if attempt == BATCH_SHED_RETRIES - 1:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    async def _run_item(self, index: int, item: dict, context_chunks: list, rag_ms: float, rag_error,
+                        semaphore: asyncio.Semaphore) -> dict:
+        result = {"id": item.get("id"), "index": index, "question": item["question"], "answer": None, "error": None, "usage": None}
+        async with semaphore:
+            started = time.monotonic()
+            with tracing.span("batch.item", index=index) as span:
+                try:
+                    result["answer"], ttft_ms, result["usage"] = await self._answer_admitted(item["question"], context_chunks)
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {e}")
+                    span.set_attribute("error", str(e))
+                    result["error"] = str(e) or type(e).__name__
+                    ttft_ms = None
+            llm_ms = round((time.monotonic() - started) * 1000, 1)
+        if rag_error and not result["error"]:
+            result["rag_error"] = rag_error
+        result["timings"] = {"rag": rag_ms, "llm": llm_ms, "ttft": ttft_ms, "total": round(rag_ms + llm_ms, 1)}
+        return result
+
+    async def run(self, items: List[dict]) -> AsyncGenerator[dict, None]:
+        """Yield one result dict per item ({"id", "question"} dicts), in completion order."""
+        results: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = []
+
+        async def produce():
+            try:
+                for start in range(0, len(items), self.embed_size):
+                    chunk = items[start:start + self.embed_size]
+                    # Don't embed far ahead of the LLM calls that will consume the contexts
+                    while sum(not t.done() for t in tasks) >= self.concurrency * 2:
+                        await asyncio.sleep(0.05)
+                    rag_started = time.monotonic()
+                    contexts, rag_error = await self._retrieve([item["question"] for item in chunk])
+                    rag_ms = round((time.monotonic() - rag_started) * 1000 / len(chunk), 1)
+                    for offset, (item, context_chunks) in enumerate(zip(chunk, contexts)):
+                        task = asyncio.create_task(
+                            self._run_item(start + offset, item, context_chunks, rag_ms, rag_error, semaphore))
+                        task.add_done_callback(lambda t: t.cancelled() or results.put_nowait(t.result()))
+                        tasks.append(task)
+                await asyncio.gather(*tasks, return_exceptions=True)
+            finally:
+                results.put_nowait(_BATCH_DONE)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                result = await results.get()
+                if result is _BATCH_DONE:
+                    break
+                yield result
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(producer, *tasks, return_exceptions=True)
+
+    async def run_jsonl(self, items: List[dict]) -> AsyncGenerator[str, None]:
+        """`run`, encoded as JSON lines, followed by a summary line."""
+        started = time.monotonic()
+        succeeded = failed = 0
+        async for result in self.run(items):
+            if result["error"]:
+                failed += 1
+            else:
+                succeeded += 1
+            yield encode_json(result) + "\n"
+        elapsed = time.monotonic() - started
+        logger.info(f"Batch finished: {succeeded} ok, {failed} failed in {elapsed:.1f}s")
+        yield encode_json({"summary": {
+            "total": len(items),
+            "succeeded": succeeded,
+            "failed": failed,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }}) + "\n"
@@ -0,0 +1,6 @@
+from app.services.cache.ttl_cache import TTLCache
+from app.services.cache.singleflight import SingleFlight
+from app.services.cache.answer_cache import SemanticAnswerCache, answer_namespace
+from app.services.cache.fanout import GenerationFanout
+
+__all__ = ["TTLCache", "SingleFlight", "SemanticAnswerCache", "answer_namespace", "GenerationFanout"]
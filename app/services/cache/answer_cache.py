@@ -0,0 +1,114 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.core.metrics import observe_cache
+
+
+def answer_namespace(*parts) -> str:
+    """Key cached answers by everything that shapes them (index version, model, admin config, prompt)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class SemanticAnswerCache:
+    """In-process cache of final answers, looked up by question-embedding similarity.
+
+    Entries live in a namespace (see `answer_namespace`); a lookup only
+    matches entries from the same namespace whose cosine similarity to the
+    question is at least `threshold`. Entries expire after `ttl` seconds and
+    the least recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int = 2000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        self._next_id = 0
+        # Per-namespace (entry ids, stacked unit vectors), rebuilt lazily after changes
+        self._matrices = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _matrix(self, namespace: str):
+        if namespace not in self._matrices:
+            ids = [i for i, e in self._entries.items() if e["namespace"] == namespace]
+            vectors = np.stack([self._entries[i]["vector"] for i in ids]) if ids else None
+            self._matrices[namespace] = (ids, vectors)
+        return self._matrices[namespace]
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            self._matrices.pop(entry["namespace"], None)
+
+    def get(self, namespace: str, embedding) -> Optional[dict]:
+        """Return {"question", "answer", "similarity"} for the closest fresh match, or None."""
+        ids, vectors = self._matrix(namespace)
+        match = None
+        if vectors is not None:
+            scores = vectors @ self._unit(embedding)
+            now = time.monotonic()
+            for idx in np.argsort(-scores):
+                if scores[idx] < self.threshold:
+                    break
+                entry_id = ids[idx]
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                if entry["expires_at"] <= now:
+                    self._remove(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                match = {"question": entry["question"], "answer": entry["answer"], "similarity": float(scores[idx])}
+                break
+
+        if match is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        observe_cache("answer", match is not None)
+        return match
+
+    def put(self, namespace: str, embedding, question: str, answer: str):
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = {
+            "namespace": namespace,
+            "vector": self._unit(embedding),
+            "question": question,
+            "answer": answer,
+            "expires_at": time.monotonic() + self.ttl,
+        }
+        self._matrices.pop(namespace, None)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._matrices.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
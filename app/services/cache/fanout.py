@@ -0,0 +1,106 @@
+import asyncio
+from typing import AsyncGenerator, Callable, Dict, Hashable
+
+from app import logger
+from app.core.metrics import observe_cache
+
+
+class Broadcast:
+    """Frames of one in-flight generation, replayable from the start by any subscriber."""
+
+    def __init__(self):
+        self.frames = []
+        self.done = False
+        self.failed = False
+        self.subscribers = 0
+        self.result = None
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def append(self, frame: str):
+        self.frames.append(frame)
+        self._notify()
+
+    def finish(self, failed: bool = False):
+        self.done = True
+        self.failed = failed
+        self._notify()
+
+    async def stream(self) -> AsyncGenerator[str, None]:
+        """Replay all frames so far, then follow live; leaving cancels the generation if nobody else is left."""
+        position = 0
+        try:
+            while True:
+                changed = self._changed
+                while position < len(self.frames):
+                    yield self.frames[position]
+                    position += 1
+                if self.done:
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                self.task.cancel()
+
+
+class GenerationFanout:
+    """Share one streamed generation between identical concurrent requests.
+
+    The first subscriber for a key starts the generation in its own task;
+    later ones replay its buffered frames from the beginning and then follow
+    it live. The generation is cancelled only once every subscriber has left.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, Broadcast] = {}
+        self.coalesced = 0
+
+    def _start(self, key: Hashable, start: Callable[[], tuple]) -> Broadcast:
+        broadcast = Broadcast()
+        source, broadcast.result = start()
+
+        async def drive():
+            failed = False
+            try:
+                async for frame in source:
+                    broadcast.append(frame)
+            except asyncio.CancelledError:
+                failed = True
+                raise
+            except Exception as e:
+                failed = True
+                logger.error(f"Shared generation failed: {e}", exc_info=True)
+            finally:
+                await source.aclose()
+                if self._inflight.get(key) is broadcast:
+                    del self._inflight[key]
+                broadcast.finish(failed)
+
+        broadcast.task = asyncio.create_task(drive())
+        return broadcast
+
+    def join(self, key: Hashable, start: Callable[[], tuple]) -> Broadcast:
+        """Return the in-flight generation for `key`, starting one with `start()` if there is none.
+
+        `start()` returns (async generator of frames, result object); the result
+        object is available as `broadcast.result` for subscribers to read once
+        the stream has finished. Follow the frames with `broadcast.stream()`.
+        """
+        broadcast = self._inflight.get(key)
+        if broadcast is not None and broadcast.subscribers == 0:
+            # Abandoned by everyone and being cancelled: don't join a stream that is about to fail
+            broadcast = None
+        joined = broadcast is not None
+        if joined:
+            self.coalesced += 1
+        else:
+            broadcast = self._start(key, start)
+            self._inflight[key] = broadcast
+        observe_cache("generation_fanout", joined)
+        broadcast.subscribers += 1
+        return broadcast
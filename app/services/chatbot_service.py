@@ -1,4 +1,6 @@
-import json
+import asyncio
+import sys
+import time
 from urllib.parse import urlparse
 from openai.types.chat import ChatCompletionChunk
 from app import logger
@@ -6,51 +8,110 @@ from typing import Optional, AsyncGenerator
 from typing import Callable
 from io import StringIO
 from app.core.config import Config
+from app.core.timing import RequestTimer
+from app.core import metrics, tracing
+from app.core.admission import AdmissionRejected, Priority, admitted
+from app.core.resilience import CircuitOpenError, resilient_stream
+from app.core.sse import END_FRAME, ERROR_FRAME, STATUS_SEARCHING_FRAME, SSEWriter, streamed_content
+from app.services.web.web_research import WebResearchService
+from app.services.web.content_retriever import WebContentRetriever
+from app.services.tools.budget import ToolResultBudget
+from app.services.llm_engine.tokenizer import message_tokens
+from app.services.compaction_service import SUMMARY_KEY, message_groups
+from app.services.tools.executor import ToolExecutor
+from app.services.cache.answer_cache import answer_namespace
+from app.services.state_manager.turn_recorder import TurnRecorder
 
 config = Config()
 
+
+CONTEXT_POINTER = "(given in the CONTEXT message after the conversation history)"
+
+
+def build_system_message(system_prompt: str) -> str:
+    """Static system text. It must not vary per question, or provider prefix caching is lost."""
+    # Templates from before the context moved out of the system message still have a placeholder
+    return system_prompt.replace("{context}", CONTEXT_POINTER)
+
+
+def build_context_message(context_chunks, file_metadata=None) -> str:
+    """Per-question RAG context and upload metadata, sent after the history."""
+    if not context_chunks:
+        formatted_context = "No relevant knowledge base entries found for this specific query."
+    elif isinstance(context_chunks, list):
+        formatted_context = "\n".join(context_chunks)
+    else:
+        formatted_context = context_chunks
+    msg = f"CONTEXT\n{formatted_context}"
+
+    if file_metadata:
+        msg += "\n\nUPLOADED FILE METADATA:\n"
+        for filename, metadata in file_metadata.items():
+            msg += f"- {filename}: {metadata['shape'][0]} rows, {len(metadata['columns'])} columns\n"
+            msg += f"  Columns: {', '.join(metadata['columns'])}\n"
+            msg += f"  Numeric: {', '.join(metadata['numeric_columns'])}\n"
+            msg += f"  Categorical: {', '.join(metadata['categorical_columns'])}\n"
+    return msg
+
+
+def build_tool_executor(web_search_service, web_fetch_service, rag_service, code_executor) -> ToolExecutor:
+    """The tool executor with its web research and page retrieval services."""
+    content_retriever = WebContentRetriever(getattr(rag_service, "embed_model", None))
+    web_research_service = WebResearchService(web_search_service, web_fetch_service, content_retriever)
+    return ToolExecutor(web_search_service, web_fetch_service, web_research_service, content_retriever, code_executor)
+
+
 class ChatbotService:
-    def __init__(self, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, store, session_id, code_executor):
+    def __init__(self, llm_engine, web_search_service, web_fetch_service, rag_service, system_prompt, store, session_id, code_executor, timer: Optional[RequestTimer] = None, answer_cache=None, fanout=None, compactor=None, tool_executor=None, tool_budget=None):
         self.llm_engine = llm_engine
         self.web_search_service = web_search_service
         self.web_fetch_service = web_fetch_service
         self.rag_service = rag_service
-        self.system_message = system_prompt
+        self.system_message = build_system_message(system_prompt)
         self.store = store
         self.code_executor = code_executor
         self.session_id = session_id
+        self.timer = timer or RequestTimer()
+        self.usage = {}
+        self.answer_cache = answer_cache
+        self.fanout = fanout
+        self.compactor = compactor
+        # Stateless and shared across requests (built once in create_app); built here only when not given
+        self.tool_executor = tool_executor or build_tool_executor(web_search_service, web_fetch_service, rag_service, code_executor)
+        self.tool_budget = tool_budget or ToolResultBudget(model=config.MODEL_NAME)
     
     def _trim_messages(self, message_list):
-        max_msgs = config.MAX_CONVERSATION_TURNS
-        if not max_msgs or max_msgs <= 0:
-            return message_list
-        
-        trimmed = message_list[-max_msgs:]
-        while trimmed and trimmed[0].get("role") == "tool":
-                trimmed.pop(0)
-        if trimmed and trimmed[-1].get("role") == "assistant" and trimmed[-1].get("tool_calls"):
-            # Keep the last assistant message with tool_calls
-            pass
-        return trimmed
-
-    def _update_system_message(self, context_chunks, file_metadata=None):
-        """Build system message with RAG context."""
-        if not context_chunks:
-            formatted_context = "No relevant knowledge base entries found for this specific query."
-        elif isinstance(context_chunks, list):
-            formatted_context = "\n".join(context_chunks)
+        # A compaction summary stands in for everything before it and is always kept
+        summary = message_list[:1] if message_list and message_list[0].get(SUMMARY_KEY) else []
+        message_list = message_list[len(summary):]
+        budget = config.HISTORY_TOKEN_BUDGET
+        if not budget or budget <= 0:
+            max_msgs = config.MAX_CONVERSATION_TURNS
+            if not max_msgs or max_msgs <= 0:
+                return summary + message_list
+            trimmed = message_list[-max_msgs:]
         else:
-            formatted_context = context_chunks
-        msg = self.system_message.replace("{context}", formatted_context)
-
-        if file_metadata:
-            msg += "\n\nUPLOADED FILE METADATA:\n"
-            for filename, metadata in file_metadata.items():
-                msg += f"- {filename}: {metadata['shape'][0]} rows, {len(metadata['columns'])} columns\n"
-                msg += f"  Columns: {', '.join(metadata['columns'])}\n"
-                msg += f"  Numeric: {', '.join(metadata['numeric_columns'])}\n"
-                msg += f"  Categorical: {', '.join(metadata['categorical_columns'])}\n"
-        return msg
+            # Newest first, whole units only; the newest unit (the question) is always kept
+            kept = []
+            used = sum(message_tokens(message, config.MODEL_NAME) for message in summary)
+            for group in reversed(message_groups(message_list)):
+                tokens = sum(message_tokens(message, config.MODEL_NAME) for message in group)
+                if kept and used + tokens > budget:
+                    break
+                kept.append(group)
+                used += tokens
+            trimmed = [message for group in reversed(kept) for message in group]
+            if len(trimmed) < len(message_list):
+                logger.debug(f"History trimmed to {len(trimmed)}/{len(message_list)} messages ({used} tokens)")
+
+        # Start on a user turn: tool results whose call was cut off cannot be sent on their own
+        while trimmed and trimmed[0].get("role") != "user":
+            trimmed.pop(0)
+        return summary + trimmed
+
+    def _build_context(self, context_chunks, file_metadata=None):
+        """Build the per-question context message (RAG chunks and upload metadata)."""
+        return build_context_message(context_chunks, file_metadata)
     
     def is_valid_http_url(self,url: str) -> bool:
         try:
@@ -59,159 +120,401 @@ class ChatbotService:
         except Exception:
             return False
     
-    async def _gpt_engine(self, messages=None, system_prompt=None) -> Optional[AsyncGenerator[ChatCompletionChunk, None]]:
+    @staticmethod
+    def _accumulate_tool_call(tool_calls: dict, func):
+        """Merge a streamed tool-call fragment into `tool_calls`, keyed by the call's index.
+
+        Parallel calls arrive interleaved; each fragment carries the index of the
+        call it belongs to, while the id and name only appear on the first one.
+        """
+        if not isinstance(func, dict):
+            func = {"name": getattr(func, "name", None), "arguments_fragment": getattr(func, "arguments", None)}
+
+        key = func.get("index")
+        if key is None:
+            key = func.get("id") or (next(reversed(tool_calls)) if tool_calls else 0)
+        call = tool_calls.setdefault(key, {"id": None, "name": None, "arguments": StringIO()})
+
+        if func.get("id"):
+            call["id"] = func["id"]
+        if func.get("name"):
+            call["name"] = func["name"]
+        if func.get("arguments_fragment"):
+            call["arguments"].write(func["arguments_fragment"])
+
+    async def _gpt_engine(self, messages=None, system_prompt=None, tool_choice=None, context=None) -> Optional[AsyncGenerator[ChatCompletionChunk, None]]:
         try:
  
-            response = self.llm_engine.stream_response(
+            # Provider blips before the first chunk are retried; admission wraps the retries so they hold one slot
+            response = resilient_stream(lambda: self.llm_engine.stream_response(
                 messages=messages,
                 system_prompt=system_prompt,
+                context=context,
+                tool_choice=tool_choice,
                 model=config.MODEL_NAME,
                 top_p=config.TOP_P,
                 max_completion_tokens=config.MAX_TOKENS,
                 temperature=config.TEMPERATURE,
                 stream=config.STREAM,
-            )
+            ), "llm", attempts=self.llm_engine.retry_attempts)
 
             logger.info(f"Successfully used {config.MODEL_NAME} for response")
-            return response
+            return admitted(response, Priority.INTERACTIVE)
         except Exception as e:
             logger.error(f"Error with {config.MODEL_NAME}: {str(e)}", exc_info=True)
             return None
 
+    @staticmethod
+    async def _none():
+        return None
+
+    async def _run_stage(self, name: str, coro, default):
+        """Await a pre-LLM stage under its timeout; a late or failed stage degrades to `default`."""
+        timeout = config.STAGE_TIMEOUTS.get(name)
+        try:
+            with self.timer.stage(name), tracing.span(f"stage.{name}"):
+                return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stage '{name}' exceeded {timeout}s, continuing without it")
+        except Exception as e:
+            logger.error(f"Stage '{name}' failed: {e}")
+        return default
+
+    def _observe_metrics(self):
+        if "ttft" in self.timer.marks:
+            metrics.TIME_TO_FIRST_TOKEN.observe(self.timer.marks["ttft"])
+        if "rag" in self.timer.stages:
+            metrics.RAG_LATENCY.observe(self.timer.stages["rag"])
+        metrics.RESPONSE_LATENCY.observe(self.timer.elapsed())
+
+    def _answer_namespace(self) -> str:
+        return answer_namespace(
+            getattr(self.rag_service, "index_version", None),
+            config.MODEL_NAME,
+            config.ADMIN_CONFIG_HASH,
+            self.system_message,
+        )
+
+    async def _replay_cached_answer(self, query: str, hit: dict, sse: SSEWriter) -> AsyncGenerator[str, None]:
+        """Stream a cached answer like a generated one, and record the turn in history."""
+        logger.info(f"Answer cache hit for session {self.session_id} (similarity {hit['similarity']:.3f})")
+        answer = hit["answer"]
+        self.timer.mark("ttft")
+        for start in range(0, len(answer), config.SSE_FLUSH_MAX_BYTES):
+            frame = sse.content(answer[start:start + config.SSE_FLUSH_MAX_BYTES])
+            if frame:
+                yield frame
+
+        await self.store.add_message(self.session_id, {"role": "user", "content": query})
+        await self.store.add_message(self.session_id, {"role": "assistant", "content": answer})
+        self._observe_metrics()
+        yield sse.event({"timings": self.timer.as_dict(), "cached": True})
+        logger.info(self.timer.log_line(session_id=self.session_id, status="ok", answer_cache="hit", sse_frames=sse.frames))
+        yield sse.frame(END_FRAME)
+
+    def _record_usage(self, usage: dict):
+        """Sum token usage (including provider prompt-cache hits) over the LLM calls of one response."""
+        for key, value in usage.items():
+            if value:
+                self.usage[key] = self.usage.get(key, 0) + value
+                metrics.LLM_TOKENS.labels(kind=key).inc(value)
+
+    async def _record_cancelled(self, partial_answer: str, pending_calls: list):
+        """Store placeholder tool results and the partial answer of a cancelled response."""
+        try:
+            for call in pending_calls:
+                await self.store.add_message(self.session_id, {
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "name": call["name"],
+                    "content": "Cancelled: the user disconnected before this tool finished.",
+                })
+            if partial_answer:
+                await self.store.add_message(self.session_id, {"role": "assistant", "content": partial_answer})
+        except Exception as e:
+            logger.error(f"Failed to record cancelled response: {e}")
+
+    async def _record_shared_cancelled(self, recorded: list, frames: list):
+        """Store what a subscriber that left a shared turn early was shown, like `_record_cancelled`.
+
+        That is the turn's history so far (question, finished tool rounds) and
+        the answer text of the frames it was streamed, not the full answer.
+        """
+        messages = [dict(message) for message in recorded]
+        if messages and messages[-1].get("role") == "assistant" and not messages[-1].get("tool_calls"):
+            # The final answer; this subscriber only saw part of it
+            messages.pop()
+        pending_calls = []
+        for message in messages:
+            if message.get("tool_calls"):
+                pending_calls = [{"id": call["id"], "name": call["function"]["name"]} for call in message["tool_calls"]]
+            elif message.get("role") == "tool":
+                pending_calls = [call for call in pending_calls if call["id"] != message.get("tool_call_id")]
+        try:
+            for message in messages:
+                await self.store.add_message(self.session_id, message)
+        except Exception as e:
+            logger.error(f"Failed to record cancelled response: {e}")
+        await self._record_cancelled(streamed_content(frames), pending_calls)
+
+    def _detached_turn(self, query: str) -> tuple:
+        """Start a first-turn generation that records into its own TurnRecorder instead of this session."""
+        recorder = TurnRecorder()
+        service = ChatbotService(
+            self.llm_engine, self.web_search_service, self.web_fetch_service, self.rag_service,
+            self.system_message, store=recorder, session_id=f"shared:{self.session_id}",
+            code_executor=self.code_executor, answer_cache=self.answer_cache,
+            tool_executor=self.tool_executor, tool_budget=self.tool_budget,
+        )
+        return service._generate_response(query), recorder
+
+    async def _respond(self, query: str, uploaded_files: Optional[list] = None) -> AsyncGenerator[str, None]:
+        """Generate a streaming response, sharing one generation among identical concurrent first turns."""
+        if self.fanout is None or uploaded_files or await self.store.get_messages(self.session_id):
+            async for frame in self._generate_response(query, uploaded_files):
+                yield frame
+            if self.compactor is not None:
+                # Summarize older turns in the background, ready for the next question
+                self.compactor.schedule(self.session_id)
+            return
+
+        key = (self._answer_namespace(), " ".join(query.lower().split()))
+        broadcast = self.fanout.join(key, lambda: self._detached_turn(query))
+        if broadcast.subscribers > 1:
+            logger.info(f"Session {self.session_id} joined an in-flight generation ({broadcast.subscribers} subscribers)")
+        frames = []
+        stream = broadcast.stream()
+        try:
+            async for frame in stream:
+                frames.append(frame)
+                yield frame
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info(f"Session {self.session_id} left a shared generation")
+            await self._record_shared_cancelled(list(broadcast.result.messages), frames)
+            raise
+        finally:
+            await stream.aclose()
+        if not broadcast.failed:
+            # Each subscriber keeps the shared turn in its own history
+            for message in broadcast.result.messages:
+                await self.store.add_message(self.session_id, dict(message))
+
     async def _generate_response(self, query: str, uploaded_files: Optional[list] = None) -> AsyncGenerator[str, None]:
         """Generate a streaming response."""
+        buffer = StringIO()
+        sse = SSEWriter()
+        pending_calls = []  # tool calls stored in history whose results are not yet stored
+        # Entered manually: a `with` block cannot wrap the generator's try/except cleanly
+        request_span = tracing.span("chat.request", session_id=self.session_id, uploads=len(uploaded_files or []))
+        request_span.__enter__()
         try:
-            messages = await self.store.get_messages(self.session_id)
-            file_metadata = None
-            if uploaded_files:
-                try:
-                    file_metadata = await self.code_executor.analyze_files(uploaded_files)
-                except Exception as e:
-                    logger.error(f"File analysis error: {e}")
-            yield f"data: {json.dumps({'status': 'Searching knowledge base...'})}\n\n"
-            try:
-                context_chunks = await self.rag_service._get_corpus_data(query)
-                if context_chunks:
-                    logger.info(f"Retrieved {context_chunks} RAG context chunks")
-            except Exception as e:
-                logger.error(f"RAG failed: {e}")
-
-            current_system_message = self._update_system_message(context_chunks, file_metadata)
-            
+            yield STATUS_SEARCHING_FRAME
+
+            cacheable = self.answer_cache is not None and not uploaded_files
+            if cacheable:
+                # Embed once: the vector serves both the answer-cache lookup and retrieval
+                messages, embedding = await asyncio.gather(
+                    self._run_stage("history", self.store.get_messages(self.session_id), []),
+                    self._run_stage("embed", self.rag_service.embed_query(query), None),
+                )
+                # Only first-turn questions are cacheable; later answers depend on the history
+                cacheable = not messages and embedding is not None
+                if cacheable:
+                    namespace = self._answer_namespace()
+                    hit = self.answer_cache.get(namespace, embedding)
+                    if hit:
+                        async for frame in self._replay_cached_answer(query, hit, sse):
+                            yield frame
+                        return
+                file_metadata = None
+                context_chunks = await self._run_stage("rag", self.rag_service._get_corpus_data(query, embedding), [])
+            else:
+                # History, file analysis and retrieval are independent: run them together
+                messages, file_metadata, context_chunks = await asyncio.gather(
+                    self._run_stage("history", self.store.get_messages(self.session_id), []),
+                    self._run_stage("files", self.code_executor.analyze_files(uploaded_files), None) if uploaded_files else self._none(),
+                    self._run_stage("rag", self.rag_service._get_corpus_data(query), []),
+                )
+            messages = list(messages)
+            if context_chunks:
+                logger.info(f"Retrieved {context_chunks} RAG context chunks")
+
+            # The system prompt stays byte-identical across requests; only the context changes
+            context = self._build_context(context_chunks, file_metadata)
+
             new_msg = {"role": "user", "content": query}
             messages.append(new_msg)
             await self.store.add_message(self.session_id, new_msg)
 
             messages = self._trim_messages(messages)
 
-            stream = await self._gpt_engine(messages=messages, system_prompt=current_system_message)
-            
-            buffer = StringIO()
-            function_called = False
-            function_name = None
-            tool_call_id = None
-            function_args = StringIO()
-            
-            async for chunk in stream:
-                if not chunk:
-                    continue
-
-                ctype = chunk.get("type")
-                content = chunk.get("content")
-                func = chunk.get("function")
-
-                if ctype == "function_call" or func:
-                    function_called = True
-                    try:
-                        name = func.get("name") if isinstance(func, dict) else getattr(func, "name", None)
-                        if name:
-                            function_name = name
-                        args_frag = func.get("arguments_fragment") if isinstance(func, dict) else getattr(func, "arguments", None)
-                        if args_frag:
-                            function_args.write(args_frag)
-                        if func.get("id"): tool_call_id = func["id"]
-                    except Exception:
-                        function_args.write(str(func))
-                    continue
-
-                if ctype == "delta" and content:
-                    buffer.write(content)
-                    yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n"
-
-            if function_called:
-                args_str = function_args.getvalue()
-                
+            system_prompt = self.system_message
+            deadline = time.monotonic() + config.TOOL_LOOP_BUDGET
+            tool_round = 0
+
+            while True:
+                # Once rounds or wall-clock budget run out, the model must answer with what it has
+                allow_tools = tool_round < config.TOOL_MAX_ROUNDS and time.monotonic() < deadline
+                llm_span = tracing.span("llm.stream", round=tool_round, engine=type(self.llm_engine).__name__, tools_allowed=allow_tools)
+                llm_span.__enter__()
+                stream = await self._gpt_engine(
+                    messages=messages,
+                    system_prompt=system_prompt,
+                    context=context,
+                    tool_choice=None if allow_tools else "none",
+                )
+                llm_stage = "llm" if tool_round == 0 else "followup"
+                llm_started = time.monotonic()
+                first_chunk = True
+                if stream is None:
+                    llm_span.__exit__(RuntimeError, None, None)
+                    raise RuntimeError("LLM stream could not be opened")
+                tool_calls = {}
+                chunks = sse.paced(stream)
+
+                try:
+                    async for chunk in chunks:
+                        if chunk is None:
+                            # Buffered content fell due while the provider was quiet
+                            frame = sse.flush()
+                            if frame:
+                                yield frame
+                            continue
+                        if not chunk:
+                            continue
+                        if first_chunk:
+                            first_chunk = False
+                            self.timer.add(f"{llm_stage}_ttft", time.monotonic() - llm_started)
+
+                        ctype = chunk.get("type")
+                        content = chunk.get("content")
+                        func = chunk.get("function")
+
+                        if ctype == "usage":
+                            self._record_usage(chunk["usage"])
+                            continue
+
+                        if ctype == "function_call" or func:
+                            self._accumulate_tool_call(tool_calls, func)
+                            continue
+
+                        if ctype == "delta" and content:
+                            self.timer.mark("ttft")
+                            buffer.write(content)
+                            frame = sse.content(content)
+                            if frame:
+                                yield frame
+                except (AdmissionRejected, CircuitOpenError):
+                    raise
+                except Exception:
+                    if not self.llm_engine.reports_provider_errors:
+                        metrics.PROVIDER_ERRORS.labels(engine=type(self.llm_engine).__name__).inc()
+                    raise
+                finally:
+                    await chunks.aclose()
+                    await stream.aclose()
+                    self.timer.add(llm_stage, time.monotonic() - llm_started)
+                    llm_span.set_attribute("tool_calls", len(tool_calls))
+                    llm_span.__exit__(*sys.exc_info())
+
+                if not tool_calls:
+                    break
+                if not allow_tools:
+                    logger.warning(f"Ignoring tool calls after {tool_round} rounds")
+                    break
+                tool_round += 1
+
+                calls = list(tool_calls.values())
+                for i, call in enumerate(calls):
+                    call["id"] = call["id"] or f"call_{tool_round}_{i}"
+                    call["arguments"] = call["arguments"].getvalue()
 
                 assistant_tool_msg = {
                     "role": "assistant",
                     "content": "",
                     "tool_calls": [{
-                        "id": tool_call_id or "call_default",
+                        "id": call["id"],
                         "type": "function",
-                        "function": {"name": function_name, "arguments": args_str}
-                    }]
+                        "function": {"name": call["name"], "arguments": call["arguments"]}
+                    } for call in calls]
                 }
                 messages.append(assistant_tool_msg)
                 await self.store.add_message(self.session_id, assistant_tool_msg)
+                pending_calls = calls
 
-                try:
-                    if function_name == "web_search":
-                        args = json.loads(args_str) if args_str.strip() else {}
-                        search_query = args.get("question", query)
-                        tool_content = await self.web_search_service.run_web_search(search_query)
-                        
-                    elif function_name == "web_fetch":
-                        args = json.loads(args_str) if args_str.strip() else {}
-                        url = args.get("url", "")
-                        tool_content = await self.web_fetch_service.fetch_and_parse(url)
-                        
-                    elif function_name == "analyze_data":
-                        args = json.loads(args_str) if args_str.strip() else {}
-                        task = args.get("TODO", "")
-                        if not task:
-                            task = query
-                        
-                        result = await self.code_executor.generate_solution(task, file_metadata)
-                        if result['success']:
-                            tool_content = f"Analysis result: {result['result']}" if result['result'] else "Task completed successfully with no output."
-                        else:
-                            tool_content = f"Analysis failed: {result['error']}"
-                                    
-                except Exception as e:
-                    logger.error(f"Tool error: {e}")
-                    tool_content = f"Error: {str(e)}"
-                
-                tool_msg = {
-                    "role": "tool",
-                    "tool_call_id": tool_call_id or "call_default",
-                    "name": function_name,
-                    "content": str(tool_content)
-                }
+                # All calls from this round run concurrently; progress is streamed as it happens
+                results = [None] * len(calls)
+                async for event in self.tool_executor.stream_all(calls, query, file_metadata, deadline=deadline):
+                    call = calls[event["index"]]
+                    frame = {"event": event["event"], "tool": call["name"], "id": call["id"], "round": tool_round}
+                    if event["event"] == "tool_finished":
+                        results[event["index"]] = event["content"]
+                        frame.update(ok=event["ok"], duration_ms=event["duration_ms"])
+                        self.timer.add(f"tool.{call['name']}", event["duration_ms"] / 1000)
+                        metrics.TOOL_LATENCY.labels(tool=call["name"]).observe(event["duration_ms"] / 1000)
+                    yield sse.event(frame)
+
+                for call, tool_content in zip(calls, results):
+                    prompt_content, history_content = self.tool_budget.apply(call["name"], tool_content, query)
+                    tool_msg = {
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "name": call["name"],
+                        "content": prompt_content
+                    }
+
+                    messages.append(tool_msg)
+                    # History keeps a compact form so later turns don't re-send the full result
+                    await self.store.add_message(self.session_id, {**tool_msg, "content": history_content})
+                pending_calls = []
 
-                messages.append(tool_msg)
-                await self.store.add_message(self.session_id, tool_msg)
-        
                 messages = self._trim_messages(messages)
-                followup_stream = await self._gpt_engine(messages=messages, system_prompt=self._update_system_message([]))
-                
-                if followup_stream:
-                    async for chunk in followup_stream:
-                        if chunk.get("type") == "delta" and chunk.get("content"):
-                            buffer.write(chunk["content"])
-                            yield f"data: {json.dumps({'content': chunk['content']})}\n\n"
+                # Follow-up rounds answer from the tool results; RAG context was for the first call
+                context = None
+
             # Finalize
             final_response = buffer.getvalue()
-            buffer.close()
+            buffer = StringIO()  # recorded below; nothing left to save if cancelled after this
             
             if final_response:
                 ai_msg = {"role": "assistant", "content": final_response}
                 messages.append(ai_msg)
                 await self.store.add_message(self.session_id, ai_msg)
+                # Answers that used tools depend on live data and are not reused
+                if cacheable and tool_round == 0:
+                    self.answer_cache.put(namespace, embedding, query, final_response)
             
             logger.info(f"✅ RESPONSE COMPLETE")
-            yield f"data: {json.dumps({'end': True})}\n\n"
+            self._observe_metrics()
+            yield sse.event({"timings": self.timer.as_dict()})
+            logger.info(self.timer.log_line(session_id=self.session_id, status="ok", tool_rounds=tool_round, sse_frames=sse.frames, **self.usage))
+            yield sse.frame(END_FRAME)
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away: the provider stream and any running tools are already
+            # being closed; keep history consistent and record what was streamed
+            logger.info(f"Response cancelled for session {self.session_id}")
+            logger.info(self.timer.log_line(session_id=self.session_id, status="cancelled"))
+            await self._record_cancelled(buffer.getvalue(), pending_calls)
+            raise
+
+        except AdmissionRejected as e:
+            request_span.set_error(e)
+            logger.warning(f"Response shed for session {self.session_id}: {e}")
+            logger.info(self.timer.log_line(session_id=self.session_id, status="shed", reason=e.reason))
+            yield sse.event({"error": "The server is busy, please try again shortly.", "retry_after": e.retry_after})
+
+        except CircuitOpenError as e:
+            request_span.set_error(e)
+            logger.warning(f"Response failed fast for session {self.session_id}: {e}")
+            logger.info(self.timer.log_line(session_id=self.session_id, status="unavailable", reason=e.reason))
+            yield sse.event({"error": "The assistant is temporarily unavailable, please try again shortly.", "retry_after": e.retry_after})
 
         except Exception as e:
+            request_span.set_error(e)
             logger.error(f"❌ ERROR in _generate_response: {e}")
             logger.error(f"Error in generate_response: {e}", exc_info=True)
-            yield f"data: {json.dumps({'error': 'An error occurred'})}\n\n"
+            logger.info(self.timer.log_line(session_id=self.session_id, status="error", error=type(e).__name__))
+            yield sse.frame(ERROR_FRAME)
+        finally:
+            request_span.__exit__(*sys.exc_info())
@@ -1,6 +1,7 @@
 from app.services.code_execution.execution_service import CodeExecutionService
 from app.services.code_execution.code_generator import CodeGenerator
 from app.services.code_execution.code_sandbox import CodeSandboxExecutor
+from app.services.code_execution.sandbox_pool import SandboxPool
 from app.services.code_execution.execution_service import CodeExecutionService
 from app.services.code_execution.csv_handler import CSVHandler
 from app.services.code_execution.file_handler_factory import FileHandlerFactory
@@ -10,6 +11,7 @@ __all__ = [
     "CodeExecutionService",
     "CodeGenerator",
     "CodeSandboxExecutor",
+    "SandboxPool",
     "CSVHandler",
     "FileHandlerFactory",
     "ExcelHandler",
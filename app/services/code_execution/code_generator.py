@@ -1,6 +1,9 @@
 # code_generator.py
 from app.core.config import Config
 from app import logger
+from app.core.admission import Priority, admission
+from app.core.resilience import retry_call
+from app.services.llm_engine.base_gpt_engine import LLMEngine
 class CodeGenerator:
     def __init__(self, llm_engine):
         self.llm_engine = llm_engine
@@ -87,9 +90,8 @@ class CodeGenerator:
             messages.append({"role": "assistant", "content": previous_code})
             messages.append({"role": "user", "content": f"ERROR:\n{previous_error}\n\nFix the code."})
         
-        response = await self.llm_engine._gpt_engine_stream(messages=messages, system_prompt=system_prompt, model=Config.MODEL_NAME, top_p=Config.TOP_P, max_completion_tokens=Config.MAX_TOKENS, temperature=Config.TEMPERATURE, stream=False)
+        async with admission.slot(Priority.CODEGEN):
+            response = await retry_call(lambda: self.llm_engine._gpt_engine_stream(messages=messages, system_prompt=system_prompt, model=Config.MODEL_NAME, top_p=Config.TOP_P, max_completion_tokens=Config.MAX_TOKENS, temperature=Config.TEMPERATURE, stream=False), "llm", attempts=self.llm_engine.retry_attempts)
         logger.info(f"generated code: {response}")
-        if hasattr(response, "choices") and response.choices:
-            return response.choices[0].message.content or ""
-
-        return ""
\ No newline at end of file
+        # OpenAI or Anthropic shape (e.g. when the router picks the Anthropic route)
+        return LLMEngine.response_text(response)
\ No newline at end of file
@@ -1,43 +1,73 @@
 # sandbox.py
-import subprocess
+import asyncio
 import tempfile
+import time
 import sys
 import os
-import traceback
 from app.core.config import Config
+from app.core.metrics import SANDBOX_RUN
 
 class CodeSandboxExecutor:
+    def __init__(self, pool=None):
+        # Optional SandboxPool of pre-warmed interpreters; without one every run starts cold
+        self.pool = pool
 
-    def execute_code(self, code: str) -> dict:
+    async def execute_code(self, code: str) -> dict:
         """Execute the given Python `code` in a subprocess using a temporary file.
 
         Returns a dict with keys: `success` (bool), `result` (stdout string or None),
         `error` (stderr or exception traceback), and `returncode` (int or None).
+        The subprocess is killed on timeout and when the calling task is cancelled
+        (e.g. the client disconnected).
         """
         tmp_path = None
+        proc = None
         try:
-            with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as tf:
-                tf.write(code)
-                tf.flush()
-                tmp_path = tf.name
+            started = time.monotonic()
+            proc = self.pool.take() if self.pool else None
+            if proc is not None:
+                # Warm interpreter: imports are done, the code arrives on stdin
+                stdin = code.encode('utf-8')
+            else:
+                with tempfile.NamedTemporaryFile('w', suffix='.py', delete=False, encoding='utf-8') as tf:
+                    tf.write(code)
+                    tf.flush()
+                    tmp_path = tf.name
 
-            proc = subprocess.run([sys.executable, tmp_path], capture_output=True, text=True, timeout=Config.HTTP_TIMEOUT)
+                stdin = None
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, tmp_path,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            stdout, stderr = await asyncio.wait_for(proc.communicate(stdin), timeout=Config.HTTP_TIMEOUT)
+            stdout = stdout.decode('utf-8', errors='replace')
+            stderr = stderr.decode('utf-8', errors='replace')
 
             success = proc.returncode == 0
             return {
                 'success': success,
-                'result': proc.stdout.strip() if success else None,
-                'error': proc.stderr.strip() if not success else None,
+                'result': stdout.strip() if success else None,
+                'error': stderr.strip() if not success else None,
                 'returncode': proc.returncode,
             }
 
-        except subprocess.TimeoutExpired as e:
-            return {'success': False, 'result': None, 'error': f'Timeout after {Config.HTTP_TIMEOUT}s: {e}', 'returncode': None}
+        except asyncio.TimeoutError:
+            return {'success': False, 'result': None, 'error': f'Timeout after {Config.HTTP_TIMEOUT}s', 'returncode': None}
         except Exception as e:
             return {'success': False, 'result': None, 'error': str(e)}
         finally:
+            if proc is not None:
+                SANDBOX_RUN.observe(time.monotonic() - started)
             if tmp_path and os.path.exists(tmp_path):
                 try:
                     os.remove(tmp_path)
                 except Exception:
                     pass
+            if proc is not None and proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+                # Reap it even if this task is being cancelled: no zombie, no unclosed pipes
+                await asyncio.shield(proc.wait())
@@ -1,4 +1,5 @@
 
+import asyncio
 import os
 from app.services.code_execution.file_handler_factory import FileHandlerFactory
 from app.services.code_execution.code_generator import CodeGenerator
@@ -6,22 +7,26 @@ from app.services.code_execution.code_sandbox import CodeSandboxExecutor
 from app.services.code_execution.base_handler_factory import BaseFileHandler
 from app import logger
 from app.core.config import Config
+from app.core import tracing
+from app.core.admission import AdmissionRejected
+from app.core.resilience import CircuitOpenError
 
 class CodeExecutionService:
-    def __init__(self, llm_engine):
+    def __init__(self, llm_engine, sandbox_pool=None):
         self.llm_engine = llm_engine
         self.code_generator = CodeGenerator(self.llm_engine)
-        self.code_executor = CodeSandboxExecutor()
+        self.code_executor = CodeSandboxExecutor(sandbox_pool)
 
     async def analyze_files(self, filepaths: list) -> dict:
-        """Analyze uploaded files, return metadata."""
-        results = {}
-        for filepath in filepaths:
-            handler = FileHandlerFactory.get_handler(filepath)
-            metadata = handler.analyze_file(filepath)
-            filename = os.path.basename(filepath)
-            results[filename] = metadata
-        return results
+        """Analyze uploaded files, return metadata.
+
+        pandas reads are blocking, so each file is analyzed in a worker thread.
+        """
+        handlers = [FileHandlerFactory.get_handler(filepath) for filepath in filepaths]
+        analyses = await asyncio.gather(*(
+            asyncio.to_thread(handler.analyze_file, filepath) for handler, filepath in zip(handlers, filepaths)
+        ))
+        return {os.path.basename(filepath): metadata for filepath, metadata in zip(filepaths, analyses)}
     
     async def generate_solution(self, task_todo: str, metadata: dict) -> dict:
         """Generate solution using Python code for the given task using LLM."""
@@ -33,11 +38,15 @@ class CodeExecutionService:
             logger.info(f"Code generation attempt {attempt}/{Config.MAX_RETRIES}")
         
             try:
-                code_response = await self.code_generator.generate_code(task_todo, metadata, previous_code, previous_error)
+                with tracing.span("codegen.attempt", attempt=attempt):
+                    with tracing.span("llm.codegen"):
+                        code_response = await self.code_generator.generate_code(task_todo, metadata, previous_code, previous_error)
+
+                    cleaned_code = BaseFileHandler.clean_code_block(code_response)
 
-                cleaned_code = BaseFileHandler.clean_code_block(code_response)
-                
-                execution_result = self.code_executor.execute_code(cleaned_code)
+                    with tracing.span("sandbox.run") as span:
+                        execution_result = await self.code_executor.execute_code(cleaned_code)
+                        span.set_attribute("success", execution_result['success'])
                 logger.debug(f"Execution result: {execution_result}")
                 if execution_result['success']:
                     logger.info(f"✅ Success on attempt {attempt}")
@@ -53,6 +62,9 @@ class CodeExecutionService:
                     previous_error = execution_result['error']
                     logger.warning(f"❌ Attempt {attempt} failed: {previous_error}")
             
+            except (AdmissionRejected, CircuitOpenError):
+                # Retrying straight into an overloaded LLM queue or an open circuit only adds load
+                raise
             except Exception as e:
                 logger.error(f"Error in attempt {attempt}: {e}")
                 previous_error = str(e)                 
@@ -0,0 +1,110 @@
+import asyncio
+import sys
+from typing import List, Optional
+
+from app import logger
+
+READY = b"__sandbox_ready__\n"
+
+# Imports the heavy libraries, reports ready, then runs the code it is sent on stdin as __main__
+_BOOTSTRAP = """
+import sys
+_module = None
+for _module in sys.argv[1:]:
+    try:
+        __import__(_module)
+    except Exception:
+        pass
+sys.stdout.write({ready!r})
+sys.stdout.flush()
+_code = sys.stdin.read()
+del _module
+# User code sees the argv of a plain `python <script>` run, not the modules preloaded above
+sys.argv = ["<sandbox>"]
+exec(compile(_code, "<sandbox>", "exec"), {{"__name__": "__main__", "__builtins__": __builtins__}})
+""".format(ready=READY.decode())
+
+
+class SandboxPool:
+    """Interpreters started ahead of time with pandas, numpy, sklearn, ... already imported.
+
+    Each process runs exactly one piece of code and exits, so runs stay as
+    isolated as a fresh `python script.py`; a replacement is started in the
+    background every time one is taken.
+    """
+
+    def __init__(self, size: int, modules: List[str], spawn_timeout: float = 60):
+        self.size = size
+        self.modules = modules
+        self.spawn_timeout = spawn_timeout
+        self._idle: List[asyncio.subprocess.Process] = []
+        self._spawning = set()
+        self._closed = False
+
+    @property
+    def ready(self) -> int:
+        return len(self._idle)
+
+    @staticmethod
+    async def _kill(proc: asyncio.subprocess.Process):
+        """Kill `proc` and reap it, even if the caller is being cancelled."""
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+        await asyncio.shield(proc.wait())
+
+    async def _spawn(self):
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-c", _BOOTSTRAP, *self.modules,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            line = await asyncio.wait_for(proc.stdout.readline(), self.spawn_timeout)
+        except BaseException:
+            await self._kill(proc)
+            raise
+        if line != READY or self._closed:
+            await self._kill(proc)
+            if line != READY:
+                logger.error(f"Sandbox interpreter failed to start: {line!r}")
+            return
+        self._idle.append(proc)
+
+    def _replenish(self):
+        while not self._closed and len(self._idle) + len(self._spawning) < self.size:
+            task = asyncio.create_task(self._spawn())
+            self._spawning.add(task)
+            task.add_done_callback(self._spawned)
+
+    def _spawned(self, task: asyncio.Task):
+        self._spawning.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Sandbox interpreter failed to start: {task.exception()}")
+
+    async def start(self):
+        """Fill the pool and wait until every interpreter has finished its imports."""
+        self._replenish()
+        await asyncio.gather(*self._spawning, return_exceptions=True)
+        logger.info(f"Sandbox pool ready with {len(self._idle)}/{self.size} interpreters")
+
+    def take(self) -> Optional[asyncio.subprocess.Process]:
+        """A warm interpreter waiting for code on stdin, or None when the pool is empty."""
+        proc = None
+        while self._idle and proc is None:
+            candidate = self._idle.pop()
+            if candidate.returncode is None:
+                proc = candidate
+        self._replenish()
+        return proc
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._spawning):
+            task.cancel()
+        for proc in self._idle:
+            await self._kill(proc)
+        self._idle.clear()
@@ -0,0 +1,164 @@
+import asyncio
+from typing import Dict, List
+
+from app import logger
+from app.core.config import Config
+from app.core import metrics
+from app.core.admission import AdmissionRejected, Priority, admission
+from app.core.resilience import CircuitOpenError, retry_call
+from app.services.llm_engine.base_gpt_engine import LLMEngine
+from app.services.llm_engine.tokenizer import message_tokens
+from app.services.state_manager.base_history import SUMMARY_KEY
+
+config = Config()
+
+SUMMARY_HEADER = "SUMMARY OF THE EARLIER CONVERSATION"
+# Longest text taken from one message into the transcript that gets summarized
+TRANSCRIPT_MESSAGE_CHARS = 2000
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You compress chat transcripts. Write a concise summary of the conversation so far that "
+    "lets the assistant continue it: the user's goals and questions, facts and numbers "
+    "established, answers and decisions given, uploaded files or tools used and what they "
+    "returned, and anything left open. Fold in the earlier summary if there is one. "
+    "Write plain prose or short bullets, no preamble."
+)
+
+
+def message_groups(message_list: List[dict]) -> List[List[dict]]:
+    """Split history into units that must be kept or dropped together.
+
+    An assistant message with tool_calls and the tool results answering it
+    form one unit; providers reject either half on its own.
+    """
+    groups = []
+    for message in message_list:
+        if message.get("role") == "tool" and groups and groups[-1][0].get("tool_calls"):
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
+
+
+class HistoryCompactor:
+    """Fold the older turns of long sessions into a rolling summary, off the request path.
+
+    After a turn, a session whose stored history exceeds `trigger_tokens` is
+    compacted in a background task: everything but the newest `keep_tokens`
+    worth of turns (and any previous summary) is summarized by the LLM into one
+    summary message, which replaces those turns in the history store. Requests
+    never wait for it; one that races a compaction simply sees the old history.
+    """
+
+    def __init__(self, llm_engine, store, trigger_tokens: int = Config.COMPACTION_TRIGGER_TOKENS,
+                 keep_tokens: int = Config.COMPACTION_KEEP_TOKENS, summary_tokens: int = Config.COMPACTION_SUMMARY_TOKENS):
+        self.llm_engine = llm_engine
+        self.store = store
+        self.trigger_tokens = trigger_tokens
+        self.keep_tokens = keep_tokens
+        self.summary_tokens = summary_tokens
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, session_id: str):
+        """Compact `session_id` in the background if it has grown past the trigger."""
+        if session_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def close(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, session_id: str):
+        try:
+            await self.compact(session_id)
+        except (AdmissionRejected, CircuitOpenError) as e:
+            # Busy or unavailable: the next turn tries again
+            logger.info(f"History compaction for session {session_id} deferred: {e}")
+            metrics.HISTORY_COMPACTIONS.labels(result="deferred").inc()
+        except Exception as e:
+            logger.error(f"History compaction for session {session_id} failed: {e}", exc_info=True)
+            metrics.HISTORY_COMPACTIONS.labels(result="failed").inc()
+
+    def _split(self, messages: List[dict]) -> int:
+        """Index of the first message kept verbatim: the newest `keep_tokens` of whole turns, starting on a user turn.
+
+        The latest turn is always kept, however long it is.
+        """
+        users = [i for i, message in enumerate(messages) if message.get("role") == "user"]
+        cut = users[-1] if users else len(messages)
+        index = len(messages)
+        kept = 0
+        for group in reversed(message_groups(messages)):
+            kept += sum(message_tokens(message, config.MODEL_NAME) for message in group)
+            if kept > self.keep_tokens:
+                break
+            index -= len(group)
+            if group[0].get("role") == "user":
+                cut = index
+        return cut
+
+    @staticmethod
+    def _transcript(messages: List[dict]) -> str:
+        lines = []
+        for message in messages:
+            role = message.get("role")
+            content = message.get("content")
+            content = content if isinstance(content, str) else str(content or "")
+            if len(content) > TRANSCRIPT_MESSAGE_CHARS:
+                content = content[:TRANSCRIPT_MESSAGE_CHARS] + " [...]"
+            if role == "tool":
+                lines.append(f"TOOL RESULT ({message.get('name', 'tool')}): {content}")
+                continue
+            if content:
+                lines.append(f"{role.upper()}: {content}")
+            for call in message.get("tool_calls") or []:
+                function = call.get("function") or {}
+                lines.append(f"ASSISTANT CALLED {function.get('name')}({function.get('arguments') or ''})")
+        return "\n\n".join(lines)
+
+    async def compact(self, session_id: str) -> bool:
+        """Summarize the older part of this session's history now; True if the history was replaced."""
+        messages = await self.store.get_messages(session_id)
+        total = sum(message_tokens(message, config.MODEL_NAME) for message in messages)
+        if total <= self.trigger_tokens:
+            return False
+
+        prefix = messages[:self._split(messages)]
+        previous = prefix[0]["content"] if prefix and prefix[0].get(SUMMARY_KEY) else None
+        turns = prefix[1:] if previous else prefix
+        if not turns:
+            return False
+
+        request = f"TRANSCRIPT\n{self._transcript(turns)}"
+        if previous:
+            request = f"EARLIER {previous}\n\n{request}"
+        async with admission.slot(Priority.BATCH):
+            response = await retry_call(lambda: self.llm_engine._gpt_engine_stream(
+                messages=[{"role": "user", "content": request}],
+                system_prompt=SUMMARY_SYSTEM_PROMPT,
+                model=config.MODEL_NAME,
+                top_p=config.TOP_P,
+                max_completion_tokens=self.summary_tokens,
+                temperature=0.2,
+                stream=False,
+                tool_choice="none",
+            ), "llm", attempts=self.llm_engine.retry_attempts)
+        text = LLMEngine.response_text(response).strip()
+        if not text:
+            raise RuntimeError("LLM returned an empty summary")
+
+        summary = {"role": "system", "content": f"{SUMMARY_HEADER}\n{text}", SUMMARY_KEY: True}
+        if not await self.store.replace_prefix(session_id, prefix, [summary]):
+            # History changed underneath us (e.g. another compaction); leave it for the next turn
+            metrics.HISTORY_COMPACTIONS.labels(result="stale").inc()
+            return False
+
+        before = sum(message_tokens(message, config.MODEL_NAME) for message in prefix)
+        logger.info(f"Compacted {len(prefix)} messages of session {session_id} ({before} -> {message_tokens(summary, config.MODEL_NAME)} tokens)")
+        metrics.HISTORY_COMPACTIONS.labels(result="ok").inc()
+        return True
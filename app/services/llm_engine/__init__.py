@@ -1,6 +1,7 @@
 from app.services.llm_engine.base_gpt_engine import LLMEngine
 from app.services.llm_engine.openai_engine import OpenAIEngine
 from app.services.llm_engine.anthropic_engine import AnthropicEngine
+from app.services.llm_engine.router_engine import RouterEngine, Route
 from app.services.llm_engine.factory import create_llm_engine
 
-__all__ = ["LLMEngine", "OpenAIEngine", "AnthropicEngine", "create_llm_engine"]
\ No newline at end of file
+__all__ = ["LLMEngine", "OpenAIEngine", "AnthropicEngine", "RouterEngine", "Route", "create_llm_engine"]
\ No newline at end of file
@@ -3,6 +3,9 @@ from typing import Any, AsyncGenerator, Optional
 from app.services.llm_engine.base_gpt_engine import LLMEngine
 from app import logger
 
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
 class AnthropicEngine(LLMEngine):
     """Anthropic LLM Engine implementation."""
 
@@ -18,6 +21,10 @@ class AnthropicEngine(LLMEngine):
                         "question": {
                             "type": "string",
                             "description": "The user's question to be rephrased and web searched."
+                        },
+                        "read_pages": {
+                            "type": "boolean",
+                            "description": "Also open the top results and return their most relevant passages. Use when snippets are unlikely to answer the question."
                         }
                     },
                     "required": ["question"]
@@ -54,22 +61,98 @@ class AnthropicEngine(LLMEngine):
             }
         ]
     
+    @staticmethod
+    def _cached_tools(tools: list) -> list:
+        """Mark the end of the tool definitions as a cache breakpoint."""
+        if not tools:
+            return tools
+        return tools[:-1] + [{**tools[-1], "cache_control": CACHE_CONTROL}]
+
+    @staticmethod
+    def _with_cached_history(messages: list, context: Optional[str]) -> list:
+        """Put a cache breakpoint at the end of the history, then append the per-question context.
+
+        The next round or turn re-sends this history unchanged, so it is read
+        from the cache; the context comes after the breakpoint and is never cached.
+        """
+        if messages and messages[-1]["content"]:
+            last = messages[-1]
+            last["content"][-1] = {**last["content"][-1], "cache_control": CACHE_CONTROL}
+        if context:
+            block = {"type": "text", "text": context}
+            if messages and messages[-1]["role"] == "user":
+                messages[-1]["content"].append(block)
+            else:
+                messages.append({"role": "user", "content": [block]})
+        return messages
+
+    @staticmethod
+    def _to_anthropic_messages(messages: list) -> list:
+        """Convert OpenAI-style history (assistant tool_calls, role=tool results) to Anthropic blocks.
+
+        Tool results become tool_result blocks in a user turn, and consecutive
+        turns with the same role are merged, as the Messages API requires.
+        """
+        converted = []
+        for msg in messages:
+            role = msg.get("role")
+            if role == "system":
+                # Conversation summaries are stored as system messages; the Messages API only takes user/assistant turns
+                role = "user"
+                blocks = [{"type": "text", "text": str(msg.get("content") or "")}]
+            elif role == "tool":
+                role = "user"
+                blocks = [{
+                    "type": "tool_result",
+                    "tool_use_id": msg.get("tool_call_id"),
+                    "content": str(msg.get("content") or ""),
+                }]
+            elif role == "assistant" and msg.get("tool_calls"):
+                blocks = [{"type": "text", "text": msg["content"]}] if msg.get("content") else []
+                for call in msg["tool_calls"]:
+                    try:
+                        args = json.loads(call["function"].get("arguments") or "{}")
+                    except json.JSONDecodeError:
+                        args = {}
+                    blocks.append({
+                        "type": "tool_use",
+                        "id": call["id"],
+                        "name": call["function"]["name"],
+                        "input": args,
+                    })
+            else:
+                content = msg.get("content")
+                blocks = content if isinstance(content, list) else [{"type": "text", "text": str(content or "")}]
+
+            if converted and converted[-1]["role"] == role:
+                converted[-1]["content"].extend(blocks)
+            else:
+                converted.append({"role": role, "content": list(blocks)})
+        return converted
+
     async def _gpt_engine_stream(self, messages: list, model: str,
                                   top_p: float, max_completion_tokens: int, temperature: float,
                                   stream: bool = True, **kwargs) -> Optional[AsyncGenerator[Any, None]]:
         try:
-            response = await self.client.messages.create(
+            request = dict(
                 model=model,
-                messages=messages,
-                system=kwargs.get("system_prompt", ""),
-                tools=self.functions,
+                # Cache order is tools -> system -> messages; each gets a breakpoint
+                messages=self._with_cached_history(self._to_anthropic_messages(messages), kwargs.get("context")),
+                system=[{"type": "text", "text": kwargs.get("system_prompt", ""), "cache_control": CACHE_CONTROL}],
+                tools=self._cached_tools(self.functions),
                 max_tokens=max_completion_tokens,
                 temperature=temperature,
                 stream=stream,
             )
+            if kwargs.get("tool_choice"):
+                # Accept the OpenAI-style string form used by ChatbotService
+                request["tool_choice"] = {"type": kwargs["tool_choice"]} if isinstance(kwargs["tool_choice"], str) else kwargs["tool_choice"]
+
+            response = await self.client.messages.create(**request)
             return response
         except Exception as e:
             logger.error(f"Error in AnthropicEngine _gpt_engine_stream: {str(e)}", exc_info=True)
+            raise
     
 
 
@@ -77,48 +160,72 @@ class AnthropicEngine(LLMEngine):
                     top_p: float, max_completion_tokens: int, temperature: float,
                     stream: bool = True , **kwargs):
         """Unified async iterator that yields normalized chunks for streaming consumers.
-        Chunk format: {"type": "delta"|"function_call"|"end"|"error", "content": str|None, "function": dict|None}
+        Pass tool_choice="none" to forbid tool calls (e.g. on the final round).
+        Chunk format: {"type": "delta"|"function_call"|"usage"|"end"|"error", "content": str|None, "function": dict|None}
+        Usage chunks also carry "usage": {"input_tokens", "cached_input_tokens", "cache_write_tokens", "output_tokens"}.
         """
         sys_prompt = kwargs.get("system_prompt", "")
         provider_stream = await self._gpt_engine_stream(
-                    messages, model, top_p, max_completion_tokens, temperature, stream=stream, system_prompt=sys_prompt
+                    messages, model, top_p, max_completion_tokens, temperature, stream=stream, system_prompt=sys_prompt,
+                    tool_choice=kwargs.get("tool_choice"), context=kwargs.get("context"),
                 )
+        usage = {}
+
+        try:
+            async for provider_chunk in provider_stream:
+                try:
+                    # Anthropic Streaming Events
+                    ctype = getattr(provider_chunk, "type", None)
+
+                    # 1. Handle Text Content
+                    if ctype == "content_block_delta" and provider_chunk.delta.type == "text_delta":
+                        content = provider_chunk.delta.text
+                        yield {"type": "delta", "content": content, "function": None}
 
-        async for provider_chunk in provider_stream:
-            try:
-                # Anthropic Streaming Events
-                ctype = getattr(provider_chunk, "type", None)
-
-                # 1. Handle Text Content
-                if ctype == "content_block_delta" and provider_chunk.delta.type == "text_delta":
-                    content = provider_chunk.delta.text
-                    yield {"type": "delta", "content": content, "function": None}
-
-                # 2. Handle Tool Use (Function Call) Start
-                elif ctype == "content_block_start" and provider_chunk.content_block.type == "tool_use":
-                    yield {
-                        "type": "function_call", 
-                        "content": None, 
-                        "function": {
-                            "name": provider_chunk.content_block.name,
-                            "id": provider_chunk.content_block.id,
-                            "arguments_fragment": ""
+                    # 2. Handle Tool Use (Function Call) Start
+                    elif ctype == "content_block_start" and provider_chunk.content_block.type == "tool_use":
+                        yield {
+                            "type": "function_call", 
+                            "content": None, 
+                            "function": {
+                                "index": provider_chunk.index,
+                                "name": provider_chunk.content_block.name,
+                                "id": provider_chunk.content_block.id,
+                                "arguments_fragment": ""
+                            }
                         }
-                    }
-                # 3. Handle Tool Use (Function Call) JSON Fragments
-                elif ctype == "content_block_delta" and provider_chunk.delta.type == "input_json_delta":
-                    yield {
-                        "type": "function_call", 
-                        "content": None, 
-                        "function": {
-                            "name": None,
-                            "id": provider_chunk.delta.id,
-                            "arguments_fragment": provider_chunk.delta.partial_json
+                    # 3. Handle Tool Use (Function Call) JSON Fragments
+                    elif ctype == "content_block_delta" and provider_chunk.delta.type == "input_json_delta":
+                        yield {
+                            "type": "function_call", 
+                            "content": None, 
+                            "function": {
+                                "index": provider_chunk.index,
+                                "name": None,
+                                "id": None,
+                                "arguments_fragment": provider_chunk.delta.partial_json
+                            }
                         }
-                    }
-                elif ctype == "content_block_delta" and provider_chunk.delta.type == "thinking_delta":
+                    elif ctype == "content_block_delta" and provider_chunk.delta.type == "thinking_delta":
+                        continue
+
+                    # 4. Token usage: input (and cache) counts on message_start, output on message_delta
+                    elif ctype == "message_start":
+                        start_usage = provider_chunk.message.usage
+                        usage["cached_input_tokens"] = getattr(start_usage, "cache_read_input_tokens", 0) or 0
+                        usage["cache_write_tokens"] = getattr(start_usage, "cache_creation_input_tokens", 0) or 0
+                        usage["input_tokens"] = (start_usage.input_tokens or 0) + usage["cached_input_tokens"] + usage["cache_write_tokens"]
+                    elif ctype == "message_delta" and getattr(provider_chunk, "usage", None):
+                        usage["output_tokens"] = provider_chunk.usage.output_tokens
+
+                except Exception:
                     continue
+        finally:
+            # Closing the provider stream stops generation (and billing) when the consumer goes away
+            close = getattr(provider_stream, "close", None)
+            if close is not None:
+                await close()
 
-            except Exception:
-                continue
+        if usage:
+            yield self._usage_chunk(**usage)
         yield {"type": "end", "content": None, "function": None}
\ No newline at end of file
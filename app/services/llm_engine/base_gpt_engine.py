@@ -7,8 +7,56 @@ class LLMEngine(ABC):
     Provide two entry points:
       - `_gpt_engine_stream(...)` returns an async generator for streaming responses
       - `_gpt_engine(...)` returns a non-streaming response object
+
+    Requests are laid out stable-first (system text, tools, history) with the
+    per-question `context` last, so providers can reuse their cached prefix.
     """
 
+    # Attempts callers make through the "llm" circuit breaker (None: Config.RETRY_MAX_ATTEMPTS)
+    retry_attempts: Optional[int] = None
+    # Set when the engine counts PROVIDER_ERRORS itself (the router does, per route); callers then skip it
+    reports_provider_errors = False
+
+    @staticmethod
+    def _strip_private(messages: list) -> list:
+        """Drop bookkeeping keys (leading underscore, e.g. cached token counts) that providers reject."""
+        return [
+            {k: v for k, v in message.items() if not k.startswith("_")} if any(k.startswith("_") for k in message) else message
+            for message in messages
+        ]
+
+    @classmethod
+    def _with_context(cls, messages: list, context: Optional[str]) -> list:
+        """Append the per-question context after the history (OpenAI-style messages)."""
+        messages = cls._strip_private(messages)
+        if not context:
+            return messages
+        return messages + [{"role": "system", "content": context}]
+
+    @staticmethod
+    def response_text(response) -> str:
+        """Text of a non-streaming response, in OpenAI (choices) or Anthropic (content blocks) shape."""
+        if getattr(response, "choices", None):
+            return response.choices[0].message.content or ""
+        if isinstance(getattr(response, "content", None), list):
+            return "".join(getattr(block, "text", "") for block in response.content)
+        return ""
+
+    @staticmethod
+    def _usage_chunk(input_tokens=0, cached_input_tokens=0, cache_write_tokens=0, output_tokens=0) -> dict:
+        return {"type": "usage", "content": None, "function": None, "usage": {
+            "input_tokens": input_tokens or 0,
+            "cached_input_tokens": cached_input_tokens or 0,
+            "cache_write_tokens": cache_write_tokens or 0,
+            "output_tokens": output_tokens or 0,
+        }}
+
+    async def warm_up(self):
+        """Open the provider connection before the first request (a model listing; no tokens are spent)."""
+        models = getattr(getattr(self, "client", None), "models", None)
+        if models is not None:
+            await models.list()
+
     @abstractmethod
     async def _gpt_engine_stream(self, messages: list, model: str,
                                  top_p: float, max_completion_tokens: int, temperature: float, stream: bool, **kwargs) -> Optional[AsyncGenerator[Any, None]]:
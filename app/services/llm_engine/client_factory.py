@@ -1,26 +1,41 @@
 from typing import Any, Optional
 import openai
 import asyncio
+import httpx
+import anthropic
 from openai import AsyncOpenAI
 from anthropic import AsyncAnthropic
 from app.core.config import Config
 
 
-def build_llm_client(provider: Optional[str], config: Config) -> Any:
+def _limits(config: Config) -> httpx.Limits:
+    """SDK default pool sizes, with idle connections kept alive for LLM_KEEPALIVE_EXPIRY."""
+    return httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY)
+
+
+def build_llm_client(provider: Optional[str], config: Config, api_key: Optional[str] = None,
+                     base_url: Optional[str] = None) -> Any:
     """Create a provider-specific low-level client based on config.
 
     Returns a client instance appropriate for the provider, or None if
     the provider expects the engine to construct its own client.
+    `api_key` and `base_url` override LLM_API_KEY / LLM_BASE_URL (used per router route).
+    SDK retries are off: app.core.resilience retries and circuit-breaks provider calls.
     """
     provider = (provider or "").lower().strip()
+    api_key = api_key or config.LLM_API_KEY
+    base_url = base_url or config.LLM_BASE_URL
 
     if provider.startswith("openai"):
-        return openai.AsyncOpenAI(api_key=config.LLM_API_KEY)
+        return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                                  http_client=openai.DefaultAsyncHttpxClient(limits=_limits(config)))
     
     if provider.startswith("deepseek"):
-        return AsyncOpenAI(api_key=config.LLM_API_KEY, base_url="https://api.deepseek.com")
+        return AsyncOpenAI(api_key=api_key, base_url=base_url or "https://api.deepseek.com", max_retries=0,
+                           http_client=openai.DefaultAsyncHttpxClient(limits=_limits(config)))
     
     if provider.startswith("anthropic"):
-        return AsyncAnthropic(api_key=config.LLM_API_KEY)
+        return AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0,
+                              http_client=anthropic.DefaultAsyncHttpxClient(limits=_limits(config)))
     
     return None
@@ -1,12 +1,16 @@
 from typing import Any
+from app.core.config import Config
 from app.services.llm_engine.anthropic_engine import AnthropicEngine
 from app.services.llm_engine.openai_engine import OpenAIEngine
 from app.services.llm_engine.deepseek_engine import DeepseekEngine
+from app.services.llm_engine.router_engine import Route, RouterEngine
+from app.services.llm_engine.client_factory import build_llm_client
 
 def create_llm_engine(provider: str, client: Any):
     """Factory for creating LLM engine instances.
 
     Extend this function to support additional providers (e.g., Claude, Google).
+    "router" builds a RouterEngine over ROUTER_PROVIDERS, each with its own client.
     """
     provider = (provider or "").lower()
     if provider.startswith("openai"):
@@ -18,4 +22,18 @@ def create_llm_engine(provider: str, client: Any):
     if provider.startswith("deepseek"):
         return DeepseekEngine(client)
 
+    if provider == "router":
+        return create_router_engine(Config)
+
     raise ValueError(f"Unsupported LLM provider: {provider}")
+
+
+def create_router_engine(config: Config) -> RouterEngine:
+    routes = []
+    for name in config.ROUTER_PROVIDERS:
+        settings = config.ROUTER_ROUTES.get(name, {})
+        route_client = build_llm_client(name, config, api_key=settings.get("api_key"), base_url=settings.get("base_url"))
+        routes.append(Route(name, create_llm_engine(name, route_client), model=settings.get("model")))
+    if not routes:
+        raise ValueError("LLM_PROVIDER=router needs ROUTER_PROVIDERS, e.g. 'openai,anthropic'")
+    return RouterEngine(routes, hedge_after=config.ROUTER_HEDGE_AFTER, explore_rate=config.ROUTER_EXPLORE_RATE)
@@ -19,6 +19,10 @@ class OpenAIEngine(LLMEngine):
                             "question": {
                                 "type": "string",
                                 "description": "The user's question to be rephrased and web searched."
+                            },
+                            "read_pages": {
+                                "type": "boolean",
+                                "description": "Also open the top results and return their most relevant passages. Use when snippets are unlikely to answer the question."
                             }
                         },
                         "required": ["question"]
@@ -67,9 +71,10 @@ class OpenAIEngine(LLMEngine):
                                   stream: bool = True, **kwargs) -> Optional[AsyncGenerator[Any, None]]:
         system_str = kwargs.get("system_prompt", "")
         try:
-            combined_messages = [{"role": "system", "content": system_str}] + messages
+            # Stable prefix first (system, tools, history); per-question context goes last
+            combined_messages = [{"role": "system", "content": system_str}] + self._with_context(messages, kwargs.get("context"))
 
-            response = await self.client.chat.completions.create(
+            request = dict(
                 model=model,
                 messages=combined_messages,
                 tools=self.tools,
@@ -78,6 +83,13 @@ class OpenAIEngine(LLMEngine):
                 temperature=temperature,
                 stream=stream,
             )
+            if kwargs.get("tool_choice"):
+                request["tool_choice"] = kwargs["tool_choice"]
+            if stream:
+                # Final chunk carries token usage, including prompt-cache hits
+                request["stream_options"] = {"include_usage": True}
+
+            response = await self.client.chat.completions.create(**request)
             return response
         except Exception as e:
             logger.error(f"Error in OpenAIEngine _gpt_engine_stream: {str(e)}", exc_info=True)
@@ -88,34 +100,53 @@ class OpenAIEngine(LLMEngine):
                                stream: bool = True, **kwargs):
         """Unified async iterator that yields normalized chunks for streaming consumers.
 
-        Chunk format: {"type": "delta"|"function_call"|"end"|"error", "content": str|None, "function": dict|None}
+        Pass tool_choice="none" to forbid tool calls (e.g. on the final round).
+        Chunk format: {"type": "delta"|"function_call"|"usage"|"end"|"error", "content": str|None, "function": dict|None}
+        Usage chunks also carry "usage": {"input_tokens", "cached_input_tokens", "cache_write_tokens", "output_tokens"}.
         """
         sys_prompt = kwargs.get("system_prompt", "")
 
         provider_stream = await self._gpt_engine_stream(
-            messages, model, top_p, max_completion_tokens, temperature, stream=stream, system_prompt=sys_prompt
+            messages, model, top_p, max_completion_tokens, temperature, stream=stream, system_prompt=sys_prompt,
+            tool_choice=kwargs.get("tool_choice"), context=kwargs.get("context"),
         )
 
-        async for provider_chunk in provider_stream:
-            try:
-                if not provider_chunk.choices:
-                    continue
-                delta = provider_chunk.choices[0].delta
-                content = getattr(delta, "content", None)
-                tool_calls = getattr(delta, "tool_calls", None)
+        try:
+            async for provider_chunk in provider_stream:
+                try:
+                    usage = getattr(provider_chunk, "usage", None)
+                    if usage:
+                        yield self._usage_chunk(
+                            input_tokens=usage.prompt_tokens,
+                            cached_input_tokens=getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0),
+                            output_tokens=usage.completion_tokens,
+                        )
+                    if not provider_chunk.choices:
+                        continue
+                    delta = provider_chunk.choices[0].delta
+                    content = getattr(delta, "content", None)
+                    tool_calls = getattr(delta, "tool_calls", None)
 
-                if tool_calls:
-                    for tc in tool_calls:
-                        yield {
-                            "type": "function_call", 
-                            "content": None, 
-                            "function": {
-                                "name": getattr(tc.function, "name", None),
-                                "arguments_fragment": getattr(tc.function, "arguments", None)
+                    if tool_calls:
+                        for tc in tool_calls:
+                            yield {
+                                "type": "function_call", 
+                                "content": None, 
+                                "function": {
+                                    "index": getattr(tc, "index", None),
+                                    "id": getattr(tc, "id", None),
+                                    "name": getattr(tc.function, "name", None),
+                                    "arguments_fragment": getattr(tc.function, "arguments", None)
+                                }
                             }
-                        }
-                elif content:
-                    yield {"type": "delta", "content": content, "function": None}
-            except Exception:
-                continue
+                    elif content:
+                        yield {"type": "delta", "content": content, "function": None}
+                except Exception:
+                    continue
+        finally:
+            # Closing the provider stream stops generation (and billing) when the consumer goes away
+            close = getattr(provider_stream, "close", None)
+            if close is not None:
+                await close()
+
         yield {"type": "end", "content": None, "function": None}
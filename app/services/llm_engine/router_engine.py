@@ -0,0 +1,242 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncGenerator, Optional
+
+from app import logger
+from app.core import metrics
+from app.core.resilience import CircuitOpenError, breaker
+from app.services.llm_engine.base_gpt_engine import LLMEngine
+
+
+class Route:
+    """One provider behind the router, with rolling health statistics and its own circuit breaker."""
+
+    # Assumed time-to-first-token before a route has been measured
+    DEFAULT_TTFT = 1.0
+    ALPHA = 0.2
+    COOLDOWN = 30.0
+
+    def __init__(self, name: str, engine: LLMEngine, model: Optional[str] = None):
+        self.name = name
+        self.engine = engine
+        self.model = model
+        self.ttft = None
+        self.error_rate = 0.0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.breaker = breaker(f"llm:{name}")
+
+    def record_success(self):
+        self.error_rate *= (1 - self.ALPHA)
+        self.consecutive_errors = 0
+
+    def record_ttft(self, seconds: float):
+        self.ttft = seconds if self.ttft is None else (1 - self.ALPHA) * self.ttft + self.ALPHA * seconds
+        self.record_success()
+
+    def record_slow(self, seconds: float):
+        """A hedged request that lost: its first token took at least `seconds`."""
+        if self.ttft is None or seconds > self.ttft:
+            self.record_ttft(seconds)
+
+    def record_error(self):
+        self.error_rate = (1 - self.ALPHA) * self.error_rate + self.ALPHA
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= 3:
+            # Stop preferring a route that keeps failing; it is retried once the cooldown ends
+            self.cooldown_until = time.monotonic() + self.COOLDOWN
+
+    def score(self) -> tuple:
+        cooling = self.cooldown_until > time.monotonic()
+        ttft = self.ttft if self.ttft is not None else self.DEFAULT_TTFT
+        return cooling, ttft * (1 + 4 * self.error_rate)
+
+    def stats(self) -> dict:
+        return {
+            "ttft": self.ttft,
+            "error_rate": round(self.error_rate, 3),
+            "cooling_down": self.cooldown_until > time.monotonic(),
+            "circuit": self.breaker.state,
+        }
+
+
+class RouterEngine(LLMEngine):
+    """Route each request to the healthiest of several engines.
+
+    Routes are ranked by rolling time-to-first-token, penalised by their
+    rolling error rate; a route that fails repeatedly cools down for a while.
+    A route that fails before its first chunk is failed over to the next one.
+    With `hedge_after` set, a second route is started when the first chunk has
+    not arrived within that many seconds, and whichever answers first wins.
+    Once a chunk has been relayed the request is committed to that route.
+
+    Each route has its own circuit breaker ("llm:<route>"); routes whose
+    circuit is open are skipped. Failover replaces retries, so callers make a
+    single attempt against the router (`retry_attempts`).
+    """
+
+    retry_attempts = 1
+    reports_provider_errors = True
+
+    def __init__(self, routes: list, hedge_after: float = 0, explore_rate: float = 0.0):
+        if not routes:
+            raise ValueError("RouterEngine needs at least one route")
+        self.routes = routes
+        self.hedge_after = hedge_after
+        self.explore_rate = explore_rate
+
+    def ranked(self) -> list:
+        order = sorted(self.routes, key=lambda r: r.score())
+        if len(order) > 1 and random.random() < self.explore_rate:
+            # Occasionally lead with another route so its statistics stay current
+            i = random.randrange(1, len(order))
+            order[0], order[i] = order[i], order[0]
+        return order
+
+    def stats(self) -> dict:
+        return {route.name: route.stats() for route in self.routes}
+
+    async def warm_up(self):
+        results = await asyncio.gather(*(route.engine.warm_up() for route in self.routes), return_exceptions=True)
+        for route, result in zip(self.routes, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Route {route.name} warm-up failed: {result}")
+        if all(isinstance(result, Exception) for result in results):
+            raise results[0]
+
+    @staticmethod
+    def _event(route: Route, event: str):
+        metrics.LLM_ROUTE_EVENTS.labels(provider=route.name, event=event).inc()
+        if event == "error":
+            # Per route: a single "RouterEngine" label would not tell the providers apart
+            metrics.PROVIDER_ERRORS.labels(engine=route.name).inc()
+
+    async def _gpt_engine_stream(self, messages: list, model: str,
+                                 top_p: float, max_completion_tokens: int, temperature: float,
+                                 stream: bool = True, **kwargs) -> Optional[AsyncGenerator[Any, None]]:
+        """Provider-native call on the best route, failing over in rank order."""
+        last_error = None
+        for route in self.ranked():
+            try:
+                route.breaker.check()
+            except CircuitOpenError as e:
+                last_error = e
+                continue
+            started = time.monotonic()
+            try:
+                response = await route.engine._gpt_engine_stream(
+                    messages, route.model or model, top_p, max_completion_tokens, temperature, stream=stream, **kwargs)
+            except asyncio.CancelledError:
+                route.breaker.release()
+                raise
+            except Exception as e:
+                route.breaker.record(e)
+                route.record_error()
+                self._event(route, "error")
+                logger.warning(f"Route {route.name} failed, trying next: {e}")
+                last_error = e
+                continue
+            route.breaker.record_success()
+            if stream:
+                route.record_ttft(time.monotonic() - started)
+            else:
+                # A whole completion took this long, not its first token
+                route.record_success()
+            return response
+        raise last_error
+
+    async def stream_response(self, messages: list, model: str,
+                              top_p: float, max_completion_tokens: int, temperature: float,
+                              stream: bool = True, **kwargs):
+        order = self.ranked()
+        pending = {}  # first-chunk task -> (route, stream, started)
+        next_route = 0
+
+        last_error = None
+
+        def launch(event: str) -> bool:
+            """Start the next route whose circuit lets a call through; False when none is left."""
+            nonlocal next_route, last_error
+            while next_route < len(order):
+                route = order[next_route]
+                next_route += 1
+                try:
+                    route.breaker.check()
+                except CircuitOpenError as e:
+                    last_error = e
+                    continue
+                self._event(route, event)
+                source = route.engine.stream_response(
+                    messages, route.model or model, top_p, max_completion_tokens, temperature, stream=stream, **kwargs)
+                pending[asyncio.ensure_future(source.__anext__())] = (route, source, time.monotonic())
+                return True
+            return False
+
+        async def discard(task, route, source):
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            route.breaker.release()
+            await source.aclose()
+
+        if not launch("selected"):
+            raise last_error
+        winner = None
+        try:
+            while winner is None:
+                timeout = None
+                if self.hedge_after and next_route < len(order) and len(pending) == 1:
+                    (_, _, started), = pending.values()
+                    timeout = max(0.0, started + self.hedge_after - time.monotonic())
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if launch("hedge"):
+                        logger.info(f"No first token after {self.hedge_after}s, hedging with {list(pending.values())[-1][0].name}")
+                    continue
+
+                for task in done:
+                    route, source, started = pending.pop(task)
+                    error = task.exception()
+                    if winner is None and (error is None or isinstance(error, StopAsyncIteration)):
+                        route.breaker.record_success()
+                        route.record_ttft(time.monotonic() - started)
+                        winner = (route, source, None if error else task.result())
+                        continue
+                    if error is None or isinstance(error, StopAsyncIteration):
+                        # Lost a same-tick race against the winner
+                        route.breaker.record_success()
+                        await source.aclose()
+                        continue
+                    route.breaker.record(error)
+                    route.record_error()
+                    self._event(route, "error")
+                    logger.warning(f"Route {route.name} failed before its first chunk: {error}")
+                    last_error = error
+                    await source.aclose()
+
+                if winner is None and not pending and not launch("failover"):
+                    raise last_error
+        except BaseException:
+            if winner is not None:
+                await winner[1].aclose()
+            raise
+        finally:
+            for task, (route, source, started) in list(pending.items()):
+                if winner is not None:
+                    route.record_slow(time.monotonic() - started)
+                await discard(task, route, source)
+
+        route, source, first = winner
+        self._event(route, "won")
+        try:
+            if first is not None:
+                yield first
+                async for chunk in source:
+                    yield chunk
+        except Exception as e:
+            route.breaker.record(e)
+            route.record_error()
+            self._event(route, "error")
+            raise
+        finally:
+            await source.aclose()
@@ -0,0 +1,51 @@
+from functools import lru_cache
+from typing import Optional
+import json
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency; fall back to a character heuristic
+    tiktoken = None
+
+# Average characters per token for English text with BPE tokenizers
+CHARS_PER_TOKEN = 4
+# Chat formats add a few tokens per message for the role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+# Private message key holding the cached count; engines strip "_" keys before sending
+TOKEN_COUNT_KEY = "_token_count"
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: Optional[str]):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in `text` with the model's tokenizer when tiktoken is available."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: dict, model: Optional[str] = None) -> int:
+    """Prompt tokens of a chat message, computed once and cached on the message itself."""
+    cached = message.get(TOKEN_COUNT_KEY)
+    if cached is not None:
+        return cached
+    content = message.get("content")
+    if content is not None and not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False)
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(content or "", model)
+    for call in message.get("tool_calls") or []:
+        function = call.get("function") or {}
+        tokens += count_tokens(function.get("name") or "", model) + count_tokens(function.get("arguments") or "", model)
+    message[TOKEN_COUNT_KEY] = tokens
+    return tokens
@@ -1,12 +1,15 @@
-from typing import List
+import hashlib
+import os
+from typing import List, Optional
 from app import logger
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.embeddings.huggingface.utils import format_query
 from llama_index.core import Document, StorageContext
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core.node_parser import SimpleNodeParser
 import asyncio
 from app.core.config import Config
-from llama_index.core import GPTVectorStoreIndex
+from llama_index.core import GPTVectorStoreIndex, QueryBundle
 import chromadb
 from app.services.data_provider_factory import get_data_provider
 
@@ -16,14 +19,47 @@ data_provider = get_data_provider(config)
 class RAGPipeline:
     def __init__(self):
         self.index = None
+        self.index_version = None
+        self._index_pid = None
         self.embed_model = HuggingFaceEmbedding(model_name=config.EMBEDDING_MODEL_NAME)
 
 
     def init_index(self):
-        self._build_index()
+        if self.index is None:
+            self._build_index()
+        elif self._index_pid != os.getpid():
+            # Built in the parent before fork: the embedding model is shared, but Chroma's
+            # SQLite connections must not be, so reopen the persisted collection here
+            self.open_index()
 
+    def open_index(self):
+        """Open the persisted Chroma collection for querying, without re-embedding anything."""
+        try:
+            from chromadb.api.client import SharedSystemClient
+            # Drop the Chroma system inherited from the parent so this process gets its own connections
+            SharedSystemClient.clear_system_cache()
+            chroma_client = chromadb.PersistentClient(path=config.INDEX_DIR)
+            chroma_collection = chroma_client.get_or_create_collection(config.COLLECTION_NAME)
+            vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+            self.index = GPTVectorStoreIndex.from_vector_store(vector_store, embed_model=self.embed_model)
+            self._index_pid = os.getpid()
+            logger.info(f"RAG index opened (version {self.index_version}).")
+        except Exception as e:
+            logger.error(f"Error opening RAG index: {e}", exc_info=True)
+            self.index = None
 
-    async def _get_corpus_data(self, question: str) -> list:
+
+    async def warm_up(self):
+        """Run the first (slow) embedding forward pass and retrieval before real traffic."""
+        embedding = await asyncio.to_thread(self.embed_model.get_query_embedding, "warm-up")
+        if self.index is not None:
+            await self._get_corpus_data("warm-up", embedding)
+
+    async def embed_query(self, question: str) -> list:
+        """Embed a question once so retrieval and the answer cache can share it."""
+        return await asyncio.to_thread(self.embed_model.get_query_embedding, question)
+
+    async def _get_corpus_data(self, question: str, embedding: Optional[list] = None) -> list:
         """
         Retrieve top-k relevant context chunks for a question using LlamaIndex.
         """
@@ -33,26 +69,55 @@ class RAGPipeline:
 
             retriever = self.index.as_retriever(similarity_top_k=config.TOP_K)
 
-            if hasattr(retriever, "aretrieve"):
-                results = await retriever.aretrieve(question)
-            else:
-                # Fallback for sync-only retriever
-                results = await asyncio.to_thread(retriever.retrieve, question)
-
-            context_chunks = []
-            for item in results:
-                node = getattr(item, "node", item)
-                if hasattr(node, "get_content"):
-                    context_chunks.append(node.get_content())
-                elif hasattr(node, "get_text"):
-                    context_chunks.append(node.get_text())
-                else:
-                    context_chunks.append(str(node))
-            return context_chunks
+            # Query embedding is CPU-bound (and aretrieve runs it on the loop), so use a worker thread
+            query = QueryBundle(query_str=question, embedding=embedding) if embedding is not None else question
+            results = await asyncio.to_thread(retriever.retrieve, query)
+
+            return self._node_texts(results)
         except Exception as e:
             logger.error(f"Error retrieving corpus data: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def _node_texts(results) -> list:
+        context_chunks = []
+        for item in results:
+            node = getattr(item, "node", item)
+            if hasattr(node, "get_content"):
+                context_chunks.append(node.get_content())
+            elif hasattr(node, "get_text"):
+                context_chunks.append(node.get_text())
+            else:
+                context_chunks.append(str(node))
+        return context_chunks
+
+    def _embed_queries(self, questions: List[str]) -> list:
+        """Embed many queries in one batched forward pass.
+
+        Queries are formatted exactly as `get_query_embedding` does (the model's
+        default instruction, e.g. BGE's, when none is configured) so batched and
+        interactive retrieval return the same neighbours.
+        """
+        model_name = self.embed_model.model_name
+        instruction = getattr(self.embed_model, "query_instruction", None)
+        return self.embed_model.get_text_embedding_batch(
+            [format_query(question, model_name, instruction) for question in questions]
+        )
+
+    def _retrieve_batch(self, questions: List[str]) -> List[list]:
+        retriever = self.index.as_retriever(similarity_top_k=config.TOP_K)
+        embeddings = self._embed_queries(questions)
+        return [
+            self._node_texts(retriever.retrieve(QueryBundle(query_str=q, embedding=emb)))
+            for q, emb in zip(questions, embeddings)
+        ]
+
+    async def get_corpus_data_batch(self, questions: List[str]) -> List[list]:
+        """Retrieve context chunks for many questions, embedding them as a single batch."""
+        if self.index is None:
+            raise RuntimeError("Index not initialized")
+        return await asyncio.to_thread(self._retrieve_batch, questions)
+
     def _build_index(self):
         try:
             raw_documents = data_provider.fetch_documents()
@@ -69,6 +134,12 @@ class RAGPipeline:
             )
             nodes = node_parser.get_nodes_from_documents(documents)
 
+            # Changes whenever the indexed content or chunking does; cached answers are keyed by it
+            digest = hashlib.sha256(f"{config.CHUNK_SIZE}:{config.CHUNK_OVERLAP}:{config.EMBEDDING_MODEL_NAME}".encode("utf-8"))
+            for doc in documents:
+                digest.update(doc.text.encode("utf-8"))
+            index_version = digest.hexdigest()[:16]
+
             # Use persistent Chroma client
             chroma_client = chromadb.PersistentClient(path=config.INDEX_DIR)
             chroma_collection = chroma_client.get_or_create_collection(config.COLLECTION_NAME)
@@ -87,7 +158,9 @@ class RAGPipeline:
             except Exception:
                 pass
 
-            logger.info("RAG index built and persisted successfully.")
+            self.index_version = index_version
+            self._index_pid = os.getpid()
+            logger.info(f"RAG index built and persisted successfully (version {index_version}).")
         except Exception as e:
             logger.error(f"Error building RAG index: {e}", exc_info=True)
             self.index = None
\ No newline at end of file
@@ -1,4 +1,5 @@
 from app.services.state_manager.base_history import BaseHistoryStore
 from app.services.state_manager.in_memory_store import InMemoryStore
+from app.services.state_manager.turn_recorder import TurnRecorder
 
-__all__ = ["BaseHistoryStore", "InMemoryStore"]
\ No newline at end of file
+__all__ = ["BaseHistoryStore", "InMemoryStore", "TurnRecorder"]
\ No newline at end of file
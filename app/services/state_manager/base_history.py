@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
 
+# Private key marking the stored summary message that stands in for compacted turns
+SUMMARY_KEY = "_summary"
+
 class BaseHistoryStore(ABC):
     @abstractmethod
     async def get_messages(self, session_id: str) -> list[dict]:
@@ -7,4 +10,12 @@ class BaseHistoryStore(ABC):
 
     @abstractmethod
     async def add_message(self, session_id: str, message: dict):
-        pass
\ No newline at end of file
+        pass
+
+    async def replace_prefix(self, session_id: str, prefix: list, replacement: list) -> bool:
+        """Replace the stored messages `prefix` (as returned by get_messages) with `replacement`.
+
+        Returns False, changing nothing, if the history no longer starts with
+        exactly those messages. Stores that cannot rewrite history return False.
+        """
+        return False
\ No newline at end of file
@@ -1,13 +1,146 @@
-from app.services.state_manager.base_history import BaseHistoryStore
+import json
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Optional
+
+from app.core import metrics
+from app.services.state_manager.base_history import SUMMARY_KEY, BaseHistoryStore
+
+
+def _message_bytes(message: dict) -> int:
+    """Approximate memory held by a stored message (its text plus a fixed per-message overhead)."""
+    size = 200
+    for value in message.values():
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, (list, dict)):
+            size += len(json.dumps(value, ensure_ascii=False, default=str))
+    return size
+
+
+class _Session:
+    __slots__ = ("messages", "bytes", "last_access")
 
-class InMemoryStore(BaseHistoryStore):
     def __init__(self):
-        self._storage = {}
+        self.messages = deque()
+        self.bytes = 0
+        self.last_access = time.monotonic()
+
+
+class InMemoryStore(BaseHistoryStore):
+    """Per-worker history store with bounded memory.
+
+    Each session keeps at most `max_messages` messages: the oldest whole turns
+    are dropped first, and a leading compaction summary is always kept.
+    Sessions idle for `idle_ttl` seconds expire, and beyond `max_sessions`
+    sessions or `max_bytes` of (approximate) message text the least recently
+    used sessions are evicted.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_bytes: int = 256 * 1024 * 1024,
+                 idle_ttl: float = 7200, max_messages: Optional[int] = 200):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages or None
+        # Least recently used first
+        self._storage: "OrderedDict[str, _Session]" = OrderedDict()
+        self._messages = 0
+        self._bytes = 0
+
+    def _drop(self, session_id: str, reason: str):
+        session = self._storage.pop(session_id)
+        self._messages -= len(session.messages)
+        self._bytes -= session.bytes
+        metrics.HISTORY_EVICTIONS.labels(reason=reason).inc()
+
+    def _expire(self):
+        if not self.idle_ttl or self.idle_ttl <= 0:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._storage:
+            session_id, session = next(iter(self._storage.items()))
+            if session.last_access > cutoff:
+                break
+            self._drop(session_id, "idle")
+
+    def _evict(self, keep: str):
+        """Evict least recently used sessions (never `keep`) until within the session and byte caps."""
+        while len(self._storage) > 1 and (
+            (self.max_sessions and len(self._storage) > self.max_sessions)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            session_id = next(iter(self._storage))
+            if session_id == keep:
+                break
+            self._drop(session_id, "lru")
+
+    def _cap(self, session: _Session):
+        """Drop the oldest turns after the summary (if any) until within `max_messages`.
+
+        Whole turns go, so the history never starts on an orphaned assistant
+        message or tool result; the turn in progress is never dropped.
+        """
+        messages = session.messages
+        head = 1 if messages and messages[0].get(SUMMARY_KEY) else 0
+        while len(messages) > self.max_messages:
+            end = next((i for i in range(head + 1, len(messages)) if messages[i].get("role") == "user"), None)
+            if end is None:
+                break
+            for _ in range(end - head):
+                dropped = _message_bytes(messages[head])
+                del messages[head]
+                session.bytes -= dropped
+                self._bytes -= dropped
+                self._messages -= 1
+
+    def _touch(self, session_id: str) -> Optional[_Session]:
+        session = self._storage.get(session_id)
+        if session is not None:
+            session.last_access = time.monotonic()
+            self._storage.move_to_end(session_id)
+        return session
 
     async def get_messages(self, session_id: str):
-        return self._storage.get(session_id, [])
+        self._expire()
+        session = self._touch(session_id)
+        # Return a copy: callers append to their working list and then call add_message
+        return list(session.messages) if session is not None else []
 
     async def add_message(self, session_id: str, message: dict):
-        if session_id not in self._storage:
-            self._storage[session_id] = []
-        self._storage[session_id].append(message)
\ No newline at end of file
+        self._expire()
+        session = self._touch(session_id)
+        if session is None:
+            session = self._storage[session_id] = _Session()
+        size = _message_bytes(message)
+        session.messages.append(message)
+        session.bytes += size
+        self._bytes += size
+        self._messages += 1
+        if self.max_messages:
+            self._cap(session)
+        self._evict(keep=session_id)
+
+    async def replace_prefix(self, session_id: str, prefix: list, replacement: list) -> bool:
+        session = self._storage.get(session_id)
+        if session is None or len(session.messages) < len(prefix):
+            return False
+        if any(a is not b for a, b in zip(session.messages, prefix)):
+            return False
+        kept = list(islice(session.messages, len(prefix), None))
+        session.messages = deque(list(replacement) + kept)
+        self._messages += len(session.messages) - len(prefix) - len(kept)
+        new_bytes = sum(_message_bytes(message) for message in session.messages)
+        self._bytes += new_bytes - session.bytes
+        session.bytes = new_bytes
+        return True
+
+    def stats(self) -> dict:
+        """Session, message and approximate byte counts (after dropping idle sessions)."""
+        self._expire()
+        return {
+            "sessions": len(self._storage),
+            "messages": self._messages,
+            "bytes": self._bytes,
+        }
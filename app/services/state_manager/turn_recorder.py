@@ -0,0 +1,18 @@
+from app.services.state_manager.base_history import BaseHistoryStore
+
+
+class TurnRecorder(BaseHistoryStore):
+    """History store for one detached turn: starts empty and just collects what is added.
+
+    Used when a turn is generated once on behalf of several sessions; each
+    session then copies `messages` into its own history.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    async def get_messages(self, session_id: str):
+        return []
+
+    async def add_message(self, session_id: str, message: dict):
+        self.messages.append(message)
@@ -0,0 +1,4 @@
+from app.services.tools.budget import ToolResultBudget
+from app.services.tools.executor import ToolExecutor
+
+__all__ = ["ToolResultBudget", "ToolExecutor"]
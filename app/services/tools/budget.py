@@ -0,0 +1,92 @@
+import re
+from typing import Optional, Tuple
+
+from app.core.config import Config
+from app.services.llm_engine.tokenizer import CHARS_PER_TOKEN, count_tokens
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_UNIT_SPLIT_RE = re.compile(r"\n\s*\n|(?<=[.!?])\s+(?=[A-Z0-9])")
+
+# Tools whose output reads like a log (errors and totals at either end)
+HEAD_TAIL_TOOLS = {"analyze_data"}
+
+
+class ToolResultBudget:
+    """Fit tool results into per-tool token budgets before they reach the model.
+
+    Log-like output keeps its head and tail; document-like output is compressed
+    extractively, keeping the units that best match the user's question. A
+    second, smaller compact form is produced for the history store so later
+    turns don't keep paying for one huge result.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+
+    def limit_for(self, tool_name: str) -> int:
+        return Config.TOOL_RESULT_TOKEN_LIMITS.get(tool_name, Config.TOOL_RESULT_DEFAULT_TOKEN_LIMIT)
+
+    def apply(self, tool_name: str, content: str, query: str = "") -> Tuple[str, str]:
+        """Return (prompt_content, history_content) for a tool result."""
+        content = str(content)
+        prompt_content = self.fit(tool_name, content, self.limit_for(tool_name), query)
+        history_content = self.fit(tool_name, prompt_content, Config.TOOL_RESULT_HISTORY_TOKENS, query)
+        return prompt_content, history_content
+
+    def fit(self, tool_name: str, content: str, limit: int, query: str = "") -> str:
+        tokens = count_tokens(content, self.model)
+        if tokens <= limit:
+            return content
+        if tool_name in HEAD_TAIL_TOOLS:
+            return self.head_tail(content, tokens, limit)
+        return self.extractive(content, limit, query)
+
+    def head_tail(self, content: str, tokens: int, limit: int) -> str:
+        """Keep the first ~60% and last ~40% of the budget, dropping the middle."""
+        chars_per_token = len(content) / max(tokens, 1)
+        head_chars = int(limit * 0.6 * chars_per_token)
+        tail_chars = int(limit * 0.4 * chars_per_token)
+        omitted = tokens - limit
+        # content[-0:] would be the whole content, not an empty tail
+        tail = content[-tail_chars:] if tail_chars > 0 else ""
+        return f"{content[:head_chars]}\n[... ~{omitted} tokens omitted ...]\n{tail}"
+
+    def extractive(self, content: str, limit: int, query: str = "") -> str:
+        """Keep the highest-scoring paragraphs/sentences, in original order, within `limit` tokens."""
+        units = [u.strip() for u in _UNIT_SPLIT_RE.split(content) if u and u.strip()]
+        if not units:
+            return ""
+
+        query_terms = {t for t in _TOKEN_RE.findall(query.lower()) if len(t) > 2}
+        scored = []
+        for i, unit in enumerate(units):
+            terms = set(_TOKEN_RE.findall(unit.lower()))
+            overlap = len(query_terms & terms) / (len(query_terms) or 1)
+            # Earlier text tends to carry titles and summaries
+            position = 1.0 / (1 + i * 0.1)
+            scored.append((overlap + 0.2 * position, i))
+        scored.sort(reverse=True)
+
+        marker_cost = count_tokens("[...]", self.model)
+        selected, used = [], 0
+        for _, i in scored:
+            cost = count_tokens(units[i], self.model) + marker_cost
+            if used + cost > limit:
+                continue
+            selected.append(i)
+            used += cost
+
+        if not selected:
+            # Even the best unit alone is over budget; cut it down
+            best = units[scored[0][1]]
+            return best[: limit * CHARS_PER_TOKEN] + " [...]"
+
+        parts, previous = [], -1
+        for i in sorted(selected):
+            if i != previous + 1:
+                parts.append("[...]")
+            parts.append(units[i])
+            previous = i
+        if previous != len(units) - 1:
+            parts.append("[...]")
+        return "\n".join(parts)
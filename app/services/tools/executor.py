@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, Optional
+
+from app import logger
+from app.core.config import Config
+from app.core import tracing
+
+
+class ToolExecutor:
+    """Dispatch model tool calls to the matching services.
+
+    `stream_all` runs every call from one model turn concurrently, each under
+    its own per-tool timeout, so total latency is that of the slowest call.
+    """
+
+    def __init__(self, web_search_service, web_fetch_service, web_research_service, content_retriever, code_executor):
+        self.web_search_service = web_search_service
+        self.web_fetch_service = web_fetch_service
+        self.web_research_service = web_research_service
+        self.content_retriever = content_retriever
+        self.code_executor = code_executor
+
+    @staticmethod
+    def _should_read_pages(args: dict) -> bool:
+        mode = Config.WEB_SEARCH_READ_MODE
+        if mode == "always":
+            return True
+        if mode == "auto":
+            return bool(args.get("read_pages"))
+        return False
+
+    async def _dispatch(self, name: str, args: dict, query: str, file_metadata: Optional[dict]) -> str:
+        if name == "web_search":
+            search_query = args.get("question", query)
+            if self._should_read_pages(args):
+                return await self.web_research_service.search_and_read(search_query)
+            return await self.web_search_service.run_web_search(search_query)
+
+        if name == "web_fetch":
+            url = args.get("url", "")
+            page = await self.web_fetch_service.fetch_and_parse(url)
+            return await self.content_retriever.condense(query, page)
+
+        if name == "analyze_data":
+            task = args.get("TODO", "") or query
+            result = await self.code_executor.generate_solution(task, file_metadata)
+            if result['success']:
+                return f"Analysis result: {result['result']}" if result['result'] else "Task completed successfully with no output."
+            return f"Analysis failed: {result['error']}"
+
+        return f"Error: unknown tool '{name}'"
+
+    async def _execute(self, name: str, arguments: str, query: str, file_metadata: Optional[dict],
+                       timeout: Optional[float] = None) -> tuple:
+        """Run one tool call. Returns (content, ok); errors and timeouts become text for the model."""
+        limit = Config.TOOL_TIMEOUTS.get(name, Config.TOOL_DEFAULT_TIMEOUT)
+        if timeout is not None:
+            limit = max(0.0, min(limit, timeout))
+        with tracing.span(f"tool.{name}", timeout=limit) as span:
+            try:
+                args = json.loads(arguments) if arguments and arguments.strip() else {}
+                return str(await asyncio.wait_for(self._dispatch(name, args, query, file_metadata), limit)), True
+            except asyncio.TimeoutError:
+                logger.error(f"Tool {name} timed out after {limit:.1f}s")
+                span.set_attribute("timed_out", True)
+                return f"Error: {name} timed out after {limit:.1f}s", False
+            except Exception as e:
+                logger.error(f"Tool error ({name}): {e}")
+                span.set_attribute("error", str(e))
+                return f"Error: {str(e)}", False
+
+    async def stream_all(self, calls: list, query: str, file_metadata: Optional[dict] = None,
+                         concurrency: int = Config.TOOL_ROUND_CONCURRENCY,
+                         deadline: Optional[float] = None) -> AsyncGenerator[dict, None]:
+        """Run `calls` ({"name", "arguments"} dicts) concurrently and yield progress events as they happen.
+
+        Yields {"event": "tool_started", "index"} and
+        {"event": "tool_finished", "index", "content", "ok", "duration_ms"} dicts.
+        At most `concurrency` calls run at once; none runs past the monotonic `deadline`.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(index: int, call: dict):
+            async with semaphore:
+                await events.put({"event": "tool_started", "index": index})
+                started = time.monotonic()
+                remaining = None if deadline is None else deadline - started
+                content, ok = await self._execute(call["name"], call["arguments"], query, file_metadata, remaining)
+                await events.put({
+                    "event": "tool_finished",
+                    "index": index,
+                    "content": content,
+                    "ok": ok,
+                    "duration_ms": round((time.monotonic() - started) * 1000),
+                })
+
+        tasks = [asyncio.ensure_future(run(i, call)) for i, call in enumerate(calls)]
+        try:
+            finished = 0
+            while finished < len(tasks):
+                event = await events.get()
+                if event["event"] == "tool_finished":
+                    finished += 1
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for cancelled tools to clean up (e.g. kill sandbox subprocesses)
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -2,5 +2,8 @@ from app.services.web.base_web_search_service import BaseWebSearchService
 from app.services.web.web_search_factory import WebSearchProviderFactory
 from app.services.web.web_search_service import WebSearchService
 from app.services.web.web_fetch import WebFetchService
+from app.services.web.fetch_cache import WebFetchCache
+from app.services.web.web_research import WebResearchService
+from app.services.web.content_retriever import WebContentRetriever
 
-__all__ = ["BaseWebSearchService", "WebSearchProviderFactory", "WebSearchService", "WebFetchService"]
\ No newline at end of file
+__all__ = ["BaseWebSearchService", "WebSearchProviderFactory", "WebSearchService", "WebFetchService", "WebFetchCache", "WebResearchService", "WebContentRetriever"]
\ No newline at end of file
@@ -0,0 +1,67 @@
+import asyncio
+from typing import List
+
+import numpy as np
+from llama_index.core import Document
+from llama_index.core.node_parser import SimpleNodeParser
+
+from app import logger
+from app.core.config import Config
+
+
+class WebContentRetriever:
+    """Ephemeral, per-call retrieval over fetched web content.
+
+    The page is chunked with the same splitter settings as the RAG index and
+    embedded with the RAG embedding model into a throwaway in-memory matrix;
+    only the chunks closest to the user's question are kept.
+    """
+
+    def __init__(self, embed_model, top_k: int = Config.WEB_CONTENT_TOP_K):
+        self.embed_model = embed_model
+        self.top_k = top_k
+        self.node_parser = SimpleNodeParser.from_defaults(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+
+    def _chunk(self, content) -> List[str]:
+        sections = content if isinstance(content, list) else [content]
+        documents = [Document(text=str(s)) for s in sections if s and str(s).strip()]
+        nodes = self.node_parser.get_nodes_from_documents(documents)
+        return [node.get_content() for node in nodes]
+
+    def rank_indices(self, query: str, chunks: List[str], top_k: int) -> List[int]:
+        """Return indices of the `top_k` chunks closest to `query`, in document order."""
+        query_vec = np.asarray(self.embed_model.get_query_embedding(query), dtype=np.float32)
+        chunk_vecs = np.asarray(self.embed_model.get_text_embedding_batch(chunks), dtype=np.float32)
+
+        norms = np.linalg.norm(chunk_vecs, axis=1) * (np.linalg.norm(query_vec) or 1.0)
+        scores = chunk_vecs @ query_vec / np.where(norms == 0, 1.0, norms)
+        best = np.argsort(-scores)[:top_k]
+        # Keep document order so the excerpt reads naturally
+        return sorted(best.tolist())
+
+    async def select_chunks(self, query: str, content, top_k: int = None) -> List[str]:
+        """Return the `top_k` chunks of `content` most relevant to `query`."""
+        top_k = top_k or self.top_k
+        chunks = await asyncio.to_thread(self._chunk, content)
+        if len(chunks) <= top_k:
+            return chunks
+        best = await asyncio.to_thread(self.rank_indices, query, chunks, top_k)
+        return [chunks[i] for i in best]
+
+    async def condense(self, query: str, content, min_chars: int = Config.WEB_CONTENT_MIN_CHARS):
+        """Reduce long fetched content to its most relevant chunks; short content is returned unchanged."""
+        if self.embed_model is None:
+            return content
+        total = sum(len(str(s)) for s in content) if isinstance(content, list) else len(str(content or ""))
+        if total <= min_chars:
+            return content
+        try:
+            chunks = await self.select_chunks(query, content)
+        except Exception as e:
+            logger.error(f"Web content retrieval failed, using full content: {e}", exc_info=True)
+            return content
+        logger.info(f"Condensed fetched content from {total} chars to {sum(len(c) for c in chunks)} chars")
+        return "\n\n...\n\n".join(chunks)
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+from app import logger
+from app.core.metrics import observe_cache
+
+# Heuristic freshness (RFC 9111 4.2.2) is capped so stale pages are revalidated at least daily
+MAX_HEURISTIC_TTL = 24 * 60 * 60
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except Exception:
+        return None
+
+
+def parse_cache_control(header: Optional[str]) -> dict:
+    """Parse a Cache-Control header into a dict of lowercase directives."""
+    directives = {}
+    if not header:
+        return directives
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" in part:
+            key, value = part.split("=", 1)
+            directives[key.strip().lower()] = value.strip().strip('"')
+        else:
+            directives[part.lower()] = True
+    return directives
+
+
+def freshness_lifetime(headers, default_ttl: int) -> Optional[int]:
+    """Return how many seconds a response stays fresh, or None if it must not be stored."""
+    cc = parse_cache_control(headers.get("cache-control"))
+    if "no-store" in cc:
+        return None
+    if "no-cache" in cc:
+        return 0
+
+    for directive in ("s-maxage", "max-age"):
+        if directive in cc:
+            try:
+                return max(0, int(cc[directive]))
+            except (TypeError, ValueError):
+                return 0
+
+    date = _parse_http_date(headers.get("date")) or time.time()
+    expires = _parse_http_date(headers.get("expires"))
+    if headers.get("expires") is not None:
+        # An invalid Expires value means "already expired"
+        return max(0, int(expires - date)) if expires else 0
+
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified:
+        return min(MAX_HEURISTIC_TTL, max(0, int((date - last_modified) * 0.1)))
+
+    return default_ttl
+
+
+class WebFetchCache:
+    """On-disk cache of parsed web_fetch results keyed by URL.
+
+    Each entry is a small JSON file holding the parsed content (not the raw
+    bytes) plus the validators needed for conditional revalidation. Total size
+    is bounded; the least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, default_ttl: int = 300):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = self._scan_size()
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _scan_size(self) -> int:
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    total += entry.stat().st_size
+        return total
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, url: str) -> Optional[dict]:
+        """Return the stored entry for `url` (fresh or stale), or None."""
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable web cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        if entry.get("url") != url:
+            return None
+        try:
+            # Touch for LRU ordering
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
+
+    @staticmethod
+    def is_fresh(entry: dict) -> bool:
+        return entry.get("expires_at", 0) > time.time()
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> dict:
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, content: Any, headers) -> bool:
+        """Store parsed `content` for `url` according to the response cache headers."""
+        ttl = freshness_lifetime(headers, self.default_ttl)
+        if ttl is None:
+            return False
+
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if ttl == 0 and not etag and not last_modified:
+            # Never fresh and cannot be revalidated: storing it would be useless
+            return False
+
+        entry = {
+            "url": url,
+            "content": content,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+            "expires_at": time.time() + ttl,
+        }
+        self._write(url, entry)
+        self._count("stores")
+        return True
+
+    def refresh(self, url: str, entry: dict, headers) -> dict:
+        """Extend a stored entry after a 304 Not Modified response."""
+        ttl = freshness_lifetime(headers, self.default_ttl)
+        entry["expires_at"] = time.time() + (ttl or 0)
+        entry["etag"] = headers.get("etag") or entry.get("etag")
+        entry["last_modified"] = headers.get("last-modified") or entry.get("last_modified")
+        self._write(url, entry)
+        self._count("revalidated")
+        observe_cache("web_fetch", hit=True)
+        return entry
+
+    def _write(self, url: str, entry: dict):
+        path = self._path(url)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        # Unique temp file: parallel tool calls may write the same URL from several threads
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._lock:
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._total_bytes += len(data) - old_size
+                over_budget = self._total_bytes > self.max_bytes
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        if over_budget:
+            self._evict()
+
+    def _remove(self, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is at 90% of its budget."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            total -= self._remove(path)
+            evicted += 1
+
+        with self._lock:
+            self._total_bytes = total
+            self._stats["evictions"] += evicted
+        if evicted:
+            logger.info(f"Web cache evicted {evicted} entries, {total} bytes remain")
+
+    def record_hit(self):
+        self._count("hits")
+        observe_cache("web_fetch", hit=True)
+
+    def record_miss(self):
+        self._count("misses")
+        observe_cache("web_fetch", hit=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["bytes"] = self._total_bytes
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["revalidated"]) / lookups if lookups else 0.0
+        return stats
@@ -1,13 +1,20 @@
+import asyncio
 import httpx
 import os
 import tempfile
+from typing import Optional
+from urllib.parse import urlparse
 
 from app.services.parser.html_parser import HTMLParser
 from app.services.parser.pdf_parser import PDFExtractor
+from app.services.web.fetch_cache import WebFetchCache
+from app.core.resilience import RETRYABLE_STATUS, retry_call
 from app import logger
 
 class WebFetchService:
-    
+    def __init__(self, cache: Optional[WebFetchCache] = None):
+        self.cache = cache
+
     def _parse_html(self, html: str) -> str:
         """Parse HTML directly (no file needed)."""
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.html', encoding='utf-8') as tmp:
@@ -31,22 +38,63 @@ class WebFetchService:
         finally:
             os.unlink(tmp_path)
 
-    async def fetch_and_parse(self, url: str) -> str:
-        """Fetch URL, detect type, parse content."""
-        
-        # 1. Fetch
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, follow_redirects=True, timeout=30)
-            content_type = response.headers.get('content-type', '')
-        # 2. Route based on type
+    async def _parse_response(self, response: httpx.Response, url: str):
+        content_type = response.headers.get('content-type', '')
         if 'html' in content_type:
             return self._parse_html(response.text)
-        
-        
+
         elif 'pdf' in content_type:
             parsed_pdf = await self._parse_pdf(response.content, url)
             return parsed_pdf
-        
+
         else:
             # Default: treat as text
-            return response.text
\ No newline at end of file
+            return response.text
+
+    async def fetch_and_parse(self, url: str) -> str:
+        """Fetch URL, detect type, parse content.
+
+        When a cache is configured, fresh entries are returned without any network
+        call and stale ones are revalidated with a conditional request.
+        """
+        entry = None
+        if self.cache:
+            entry = await asyncio.to_thread(self.cache.get, url)
+            if entry and self.cache.is_fresh(entry):
+                self.cache.record_hit()
+                return entry["content"]
+
+        # 1. Fetch (retried on transient failures; one breaker per host, so a dead site fails fast)
+        async with httpx.AsyncClient() as client:
+            async def get():
+                response = await client.get(
+                    url,
+                    follow_redirects=True,
+                    timeout=30,
+                    headers=WebFetchCache.conditional_headers(entry),
+                )
+                if response.status_code in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                return response
+
+            response = await retry_call(get, f"web_fetch:{urlparse(url).netloc}")
+
+        if entry and response.status_code == 304:
+            try:
+                await asyncio.to_thread(self.cache.refresh, url, entry, response.headers)
+            except Exception as e:
+                logger.warning(f"Failed to refresh cached {url}: {e}")
+            return entry["content"]
+
+        if self.cache:
+            self.cache.record_miss()
+
+        # 2. Route based on type
+        parsed = await self._parse_response(response, url)
+
+        if self.cache and response.status_code == 200 and parsed:
+            try:
+                await asyncio.to_thread(self.cache.put, url, parsed, response.headers)
+            except Exception as e:
+                logger.warning(f"Failed to cache {url}: {e}")
+        return parsed
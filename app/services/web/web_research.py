@@ -0,0 +1,136 @@
+import asyncio
+import math
+import re
+from collections import Counter
+from typing import Optional
+
+from app import logger
+from app.core.config import Config
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1]
+
+
+def split_passages(content, max_chars: int = Config.WEB_READ_PASSAGE_CHARS) -> list:
+    """Split parsed page content (a list of HTML sections or one string) into passages."""
+    sections = content if isinstance(content, list) else [content or ""]
+    passages = []
+    for section in sections:
+        for block in re.split(r"\n\s*\n", str(section)):
+            block = block.strip()
+            while block:
+                passages.append(block[:max_chars])
+                block = block[max_chars:].strip()
+    return passages
+
+
+def rank_passages(query: str, passages: list, top_k: int) -> list:
+    """Return the indices of the `top_k` passages that best match `query` (BM25 scoring)."""
+    query_terms = set(_tokenize(query))
+    if not passages or not query_terms:
+        return []
+
+    docs = [Counter(_tokenize(p)) for p in passages]
+    avg_len = sum(sum(d.values()) for d in docs) / len(docs) or 1.0
+    n = len(docs)
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for d in docs if term in d)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    k1, b = 1.2, 0.75
+    scores = []
+    for i, doc in enumerate(docs):
+        length = sum(doc.values())
+        score = 0.0
+        for term in query_terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+        if score > 0:
+            scores.append((score, i))
+
+    scores.sort(reverse=True)
+    return [i for _, i in scores[:top_k]]
+
+
+class WebResearchService:
+    """Search, then read the top results concurrently and keep only the best passages.
+
+    Replaces the search -> LLM -> web_fetch -> LLM round-trips with a single
+    parallel fan-out bounded by a per-URL timeout and a global deadline.
+    """
+
+    def __init__(self, web_search_service, web_fetch_service, content_retriever=None):
+        self.web_search_service = web_search_service
+        self.web_fetch_service = web_fetch_service
+        # Optional WebContentRetriever; embedding ranking replaces BM25 when available
+        self.content_retriever = content_retriever
+
+    async def _read(self, url: str):
+        return await asyncio.wait_for(self.web_fetch_service.fetch_and_parse(url), Config.WEB_READ_URL_TIMEOUT)
+
+    async def fetch_pages(self, urls: list, deadline: float = Config.WEB_READ_DEADLINE) -> dict:
+        """Fetch and parse `urls` concurrently. Returns {url: content} for pages read in time."""
+        tasks = {asyncio.ensure_future(self._read(url)): url for url in urls}
+        if not tasks:
+            return {}
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.info(f"Web read deadline hit, dropped {len(pending)} page(s)")
+
+        pages = {}
+        for task in done:
+            url = tasks[task]
+            try:
+                pages[url] = task.result()
+            except Exception as e:
+                logger.warning(f"Web read failed for {url}: {type(e).__name__}: {e}")
+        return pages
+
+    async def _rank(self, query: str, passages: list) -> list:
+        top_k = Config.WEB_READ_MAX_PASSAGES
+        if self.content_retriever is not None and self.content_retriever.embed_model is not None and len(passages) > top_k:
+            try:
+                return await asyncio.to_thread(self.content_retriever.rank_indices, query, passages, top_k)
+            except Exception as e:
+                logger.warning(f"Embedding ranking failed, falling back to BM25: {e}")
+        return rank_passages(query, passages, top_k)
+
+    async def search_and_read(self, query: str, num_results: int = Config.WEB_SEARCH_NUM_RESULTS,
+                              read_top_n: Optional[int] = None) -> str:
+        try:
+            items = await self.web_search_service.search(query, num_results)
+        except Exception as e:
+            logger.error(f"Exception during web search: {e}", exc_info=True)
+            return f"Search error: {str(e)}"
+        if not items:
+            return await self.web_search_service.run_web_search(query, num_results)
+
+        read_top_n = Config.WEB_READ_TOP_N if read_top_n is None else read_top_n
+        urls = [r["link"] for r in items[:read_top_n] if r.get("link")]
+        pages = await self.fetch_pages(urls)
+
+        # Rank passages from all pages together so the best evidence wins regardless of source
+        passages = []
+        for url in urls:
+            for passage in split_passages(pages.get(url)):
+                passages.append((url, passage))
+        best = await self._rank(query, [p for _, p in passages])
+        by_url = {}
+        for i in sorted(best):
+            url, passage = passages[i]
+            by_url.setdefault(url, []).append(passage)
+
+        formatted = []
+        for r in items:
+            entry = f"Title: {r['title']}\nSnippet: {r['snippet']}\nLink: {r['link']}"
+            if by_url.get(r["link"]):
+                entry += "\nRelevant passages:\n" + "\n---\n".join(by_url[r["link"]])
+            formatted.append(entry)
+        return "\n\n".join(formatted)
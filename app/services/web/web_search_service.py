@@ -2,6 +2,8 @@ from serpapi.google_search import GoogleSearch
 import httpx
 from app import logger
 from app.core.config import Config
+from app.core.resilience import RETRYABLE_STATUS, retry_call
+from app.services.cache import SingleFlight, TTLCache
 from app.services.web.base_web_search_service import BaseWebSearchService
 
 class WebSearchService(BaseWebSearchService):
@@ -9,38 +11,73 @@ class WebSearchService(BaseWebSearchService):
         self.cse_id = cse_id
         self.web_search_api = web_search_api
         self.http_client = http_client
+        self.cache = TTLCache(ttl=Config.WEB_SEARCH_CACHE_TTL, max_entries=Config.WEB_SEARCH_CACHE_MAX_ENTRIES, name="web_search")
+        self._singleflight = SingleFlight()
+
+    @staticmethod
+    def _cache_key(query: str, num_results: int) -> tuple:
+        """Normalize case and whitespace so trivially different phrasings share an entry."""
+        return (" ".join(str(query).lower().split()), int(num_results))
+
+    async def search(self, query, num_results=Config.WEB_SEARCH_NUM_RESULTS) -> list[dict]:
+        """Return structured results: a list of {"title", "snippet", "link"} dicts.
+
+        Raises RuntimeError when the search API reports an error.
+        """
+        key = self._cache_key(query, num_results)
+        if Config.WEB_SEARCH_CACHE_TTL > 0:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Concurrent identical searches share one upstream call
+        return await self._singleflight.do(key, lambda: self._search_and_cache(key, query, num_results))
 
     async def run_web_search(self, query, num_results=Config.WEB_SEARCH_NUM_RESULTS) -> str:
         try:
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
-                "q": query,
-                "key": self.web_search_api,
-                "cx": self.cse_id,
-                "num": num_results,
-                "engine": "google"
-            }
-            response = await self.http_client.get(url, params=params, timeout=Config.HTTP_TIMEOUT)
-            results = response.json()
-            
-            # Check for errors in the response
-            if "error" in results:
-                logger.error(f"Web search error: {results['error']}")
-                return f"Search error: {results['error']}"
-            
-            # Extract top organic results
-            items = results.get("items", [])
-            if not items:
-                return "No search results found."
-                
-            formatted = []
-            for r in items:
-                title = r.get("title", "")
-                snippet = r.get("snippet", "")
-                link = r.get("link", "")
-                formatted.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}")
-                logger.info(f"Web search result - Title: {title}, Link: {link}")
-            return "\n\n".join(formatted)
+            items = await self.search(query, num_results)
         except Exception as e:
             logger.error(f"Exception during web search: {e}", exc_info=True)
             return f"Search error: {str(e)}"
+
+        if not items:
+            return "No search results found."
+        return "\n\n".join(
+            f"Title: {r['title']}\nSnippet: {r['snippet']}\nLink: {r['link']}" for r in items
+        )
+
+    async def _search_and_cache(self, key: tuple, query, num_results) -> list[dict]:
+        items = await retry_call(lambda: self._search_upstream(query, num_results), "web_search")
+        if Config.WEB_SEARCH_CACHE_TTL > 0:
+            self.cache.set(key, items)
+        return items
+
+    async def _search_upstream(self, query, num_results) -> list[dict]:
+        """Call the Custom Search API and normalize the organic results."""
+        url = "https://www.googleapis.com/customsearch/v1"
+        params = {
+            "q": query,
+            "key": self.web_search_api,
+            "cx": self.cse_id,
+            "num": num_results,
+            "engine": "google"
+        }
+        response = await self.http_client.get(url, params=params, timeout=Config.HTTP_TIMEOUT)
+        if response.status_code in RETRYABLE_STATUS:
+            # Raise with the status so throttling and outages are retried and counted by the breaker
+            response.raise_for_status()
+        results = response.json()
+
+        # Check for errors in the response
+        if "error" in results:
+            logger.error(f"Web search error: {results['error']}")
+            raise RuntimeError(results['error'])
+
+        # Extract top organic results
+        items = []
+        for r in results.get("items", []):
+            title = r.get("title", "")
+            link = r.get("link", "")
+            items.append({"title": title, "snippet": r.get("snippet", ""), "link": link})
+            logger.info(f"Web search result - Title: {title}, Link: {link}")
+        return items
@@ -0,0 +1,52 @@
+"""Production ASGI entry point.
+
+    gunicorn asgi:app                       # settings from gunicorn.conf.py (preload_app)
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+Importing this module loads the embedding model and builds the RAG index
+once. Under gunicorn with `preload_app` that happens in the master before it
+forks, so every worker shares the model's memory copy-on-write instead of
+loading its own copy. Everything that holds sockets, tasks or locks (HTTP and
+provider clients, caches, the sandbox pool) is built per worker by
+`create_worker_app`, on the first ASGI event the worker receives.
+
+`uvicorn --workers N` starts workers by spawning, not forking, so each of
+them loads its own model; use gunicorn to run several workers.
+"""
+import gc
+import os
+
+from app import create_app, logger
+from app.services.rag_service import RAGPipeline
+
+rag_service = RAGPipeline()
+rag_service.init_index()
+logger.info(f"Preloaded embedding model and RAG index in process {os.getpid()}")
+
+
+def create_worker_app():
+    """Per-worker app on top of the preloaded model and index."""
+    return create_app(rag_service=rag_service)
+
+
+class WorkerApp:
+    """ASGI app that builds the real app inside whichever process serves it."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._app = None
+        self._pid = None
+
+    async def __call__(self, scope, receive, send):
+        if self._pid != os.getpid():
+            self._app = self.factory()
+            self._pid = os.getpid()
+        await self._app(scope, receive, send)
+
+
+app = WorkerApp(create_worker_app)
+
+# Everything allocated so far lives for the whole process: keep the collector from
+# touching it (and dirtying the shared pages) in forked workers
+gc.collect()
+gc.freeze()
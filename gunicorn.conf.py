@@ -0,0 +1,29 @@
+"""gunicorn settings for `gunicorn asgi:app` (read automatically from the working directory)."""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import asgi.py (embedding model, RAG index) once in the master, then fork the workers
+preload_app = True
+# Let in-flight streams finish on restart
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+keepalive = 5
+
+
+def on_starting(server):
+    # Samples of previous runs would otherwise be summed into /metrics
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for name in os.listdir(multiproc_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(multiproc_dir, name))
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges (in-flight, active calls, ...) from /metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -61,8 +61,8 @@ def main():
     # Production guidance: expose the ASGI `app` from `asgi.py` and run with an ASGI server
     print("Production runner: use an ASGI server to run the app, for example:")
     print()
-    print("  uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4")
-    print("  gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:app")
+    print("  gunicorn asgi:app            # settings in gunicorn.conf.py; workers share the preloaded model")
+    print("  uvicorn asgi:app --host 0.0.0.0 --port 8000")
     print()
     print("To run interactively for local development: `python main.py --dev`")
 
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for SSE framing of streamed chat responses.
+
+Compares one `json.dumps` frame per provider delta (the previous behaviour)
+with the coalescing SSEWriter, reporting frames per response, frames/sec and
+CPU time per response.
+
+Run from the project root: python -m scripts.bench_sse [--responses N] [--deltas N]
+"""
+import argparse
+import json
+import random
+import time
+
+from app.core.sse import END_FRAME, SSEWriter
+
+
+def make_deltas(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    words = ["the", "model", "streams", "tokens", "quickly", "über", "—", "data", "frame", "\n"]
+    return [" " + " ".join(rng.choice(words) for _ in range(rng.randint(1, 2))) for _ in range(count)]
+
+
+def naive(deltas: list) -> int:
+    frames = 0
+    for d in deltas:
+        _ = f"data: {json.dumps({'content': d}, ensure_ascii=False)}\n\n"
+        frames += 1
+    _ = f"data: {json.dumps({'end': True})}\n\n"
+    return frames + 1
+
+
+def coalesced(deltas: list, delay: float) -> int:
+    writer = SSEWriter()
+    for d in deltas:
+        if delay:
+            time.sleep(delay)
+        writer.content(d)
+    writer.frame(END_FRAME)
+    return writer.frames
+
+
+def run(name: str, fn, responses: int) -> None:
+    wall, cpu = time.perf_counter(), time.process_time()
+    frames = sum(fn() for _ in range(responses))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    print(f"{name:<28} frames/response={frames / responses:8.1f}  "
+          f"frames/sec={frames / wall:12.0f}  cpu/response={cpu / responses * 1e6:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE framing micro-benchmark")
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--deltas", type=int, default=400, help="provider deltas per response")
+    parser.add_argument("--delta-ms", type=float, default=0.0,
+                        help="simulated gap between deltas (the time-based flush only matters when > 0)")
+    args = parser.parse_args()
+
+    deltas = make_deltas(args.deltas)
+    delay = args.delta_ms / 1000
+    responses = args.responses if not delay else max(1, min(args.responses, 5))
+
+    run("per-delta json.dumps", lambda: naive(deltas), responses)
+    run("SSEWriter (coalesced)", lambda: coalesced(deltas, delay), responses)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Local stand-in for an OpenAI-compatible chat completions endpoint.
+
+Streams a canned answer and reports prompt-cache usage the way providers do:
+`cached_tokens` is the size of the longest message prefix seen in an earlier
+request. Point ChatPilot at it to check request layout and cache reporting
+without a provider account:
+
+    python -m scripts.stub_llm_server --port 8001
+    LLM_PROVIDER=openai LLM_API_KEY=stub LLM_BASE_URL=http://127.0.0.1:8001/v1 python main.py --dev
+
+`--ttft-delay` and `--fail-rate` make it a slow or flaky provider, e.g. to
+exercise LLM_PROVIDER=router with two stand-ins on different ports.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+ANSWER = "This is a canned answer from the local stand-in server."
+
+app = FastAPI()
+_seen_prefixes = {}
+_behaviour = {"ttft_delay": 0.0, "fail_rate": 0.0}
+
+
+def _tokens(obj) -> int:
+    return max(1, len(json.dumps(obj, ensure_ascii=False)) // 4)
+
+
+def _cached_tokens(body: dict) -> int:
+    """Record every message prefix of this request; return the tokens of the longest one already seen."""
+    head = {"tools": body.get("tools")}
+    digest = hashlib.sha256(json.dumps(head, sort_keys=True).encode())
+    cached, size = 0, _tokens(head)
+    for message in body.get("messages", []):
+        digest.update(json.dumps(message, sort_keys=True).encode())
+        size += _tokens(message)
+        key = digest.copy().hexdigest()
+        if key in _seen_prefixes:
+            cached = size
+        _seen_prefixes[key] = True
+    return cached
+
+
+def _chunk(model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < _behaviour["fail_rate"]:
+        return JSONResponse({"error": {"message": "stub overloaded", "type": "server_error"}}, status_code=503)
+    await asyncio.sleep(_behaviour["ttft_delay"])
+    model = body.get("model", "stub")
+    prompt_tokens = _tokens({"tools": body.get("tools"), "messages": body.get("messages")})
+    cached = min(_cached_tokens(body), prompt_tokens)
+    words = ANSWER.split(" ")
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(words),
+        "total_tokens": prompt_tokens + len(words),
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+    print(f"prompt_tokens={prompt_tokens} cached_tokens={cached}", flush=True)
+
+    if not body.get("stream"):
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    async def stream():
+        yield _chunk(model, {"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            await asyncio.sleep(0.02)
+            yield _chunk(model, {"content": word if i == 0 else f" {word}"})
+        yield _chunk(model, {}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield f"data: {json.dumps({'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-delay", type=float, default=0.0, help="seconds before the first chunk")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    _behaviour.update(ttft_delay=args.ttft_delay, fail_rate=args.fail_rate)
+    uvicorn.run(app, host=args.host, port=args.port)